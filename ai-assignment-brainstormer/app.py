@@ -5,12 +5,145 @@ Powered by Kimi K2 via Ollama Cloud
 """
 
 import streamlit as st
-from database import init_db, save_prompt, get_prompt_history
-from kimi_api import generate_content
-from file_processor import process_uploaded_file
+from database import init_db, get_prompt_history, get_prompt, search_prompts
+from kimi_api import current_session
+from jobs import FINISHED, cancel_job, get_job, recover_jobs, run_file_analysis, run_generation, submit_job
+from rate_limiter import queue_status
+from theme import THEMES, THEME_CSS
 
-# Initialize database
-init_db()
+
+# Initialize database once per process, not on every rerun
+@st.cache_resource
+def _init_db():
+    init_db()
+    recover_jobs()
+
+
+_init_db()
+
+HISTORY_PAGE_SIZE = 10
+JOB_POLL_SECONDS = 0.3  # redraw a running job's answer this often
+
+
+def _render_job(job: dict, title: str, waiting_message: str):
+    """Draw a job's extraction details and its answer (partial while running)."""
+    if job["kind"] == "file" and job["note"]:
+        st.info(job["note"])
+        with st.expander("👁️ Preview Teks yang Diekstrak"):
+            st.text_area("Extracted Text", job["preview"] or "", height=200)
+
+    st.markdown(f"### 🎉 {title}")
+    if job["status"] not in FINISHED:
+        if job["queue"]:
+            # Every worker of this kind is busy; the job hasn't started yet
+            st.info(
+                f"⏳ Menunggu slot proses: antrian ke-{job['queue']['position']} dari {job['queue']['waiting']}"
+            )
+        elif job["result"]:
+            st.markdown(job["result"] + "▌")
+        elif job["files"] and not job["note"]:
+            icons = {"waiting": "⏳", "extracting": "📄", "done": "✅", "failed": "⚠️", "cancelled": "⏹️"}
+            for entry in job["files"]:
+                label = f"{icons[entry['status']]} {entry['name']}"
+                if entry["status"] == "failed":
+                    st.caption(f"{label}: {entry['error']}")
+                elif entry["progress"]:
+                    done, total = entry["progress"]
+                    st.progress(done / total, text=f"{label} ({done}/{total})")
+                else:
+                    st.caption(label)
+        else:
+            status = queue_status(job["session"]) if job["session"] else None
+            if status:
+                st.info(
+                    f"⏳ Menunggu giliran: antrian ke-{status['position']} dari {status['waiting']}"
+                    f" (sekitar {status['eta']:.0f} detik)"
+                )
+            else:
+                st.info(waiting_message)
+        if st.button("⏹️ Batalkan", key=f"cancel_{job['id']}"):
+            cancel_job(job["id"])
+        return
+
+    if job["result"]:
+        st.markdown(f"""
+        <div class="result-container">
+            {job["result"]}
+        </div>
+        """, unsafe_allow_html=True)
+        if job["kind"] != "file" and job["note"]:
+            st.caption(job["note"])
+
+    if job["status"] == "done":
+        # Also show in proper markdown format
+        with st.expander("📖 Lihat dalam format Markdown", expanded=True):
+            st.markdown(job["result"])
+        if job["history_id"]:
+            st.success("✅ Hasil disimpan ke database!")
+        elif job["error"]:
+            st.warning(f"⚠️ Hasil belum tersimpan ke riwayat: {job['error']}")
+    elif job["status"] == "cancelled":
+        st.warning("⏹️ Dibatalkan.")
+    else:
+        st.error(f"⚠️ Error: {job['error']}")
+        if job["kind"] == "generate":
+            st.info("💡 Pastikan Ollama sudah berjalan dan terhubung ke cloud")
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(job_id: str, title: str, waiting_message: str):
+    # Only this fragment reruns while the job works; the rest of the page
+    # (and any widget the user touches) never waits on it
+    job = get_job(job_id)
+    if job is None or job["status"] in FINISHED:
+        st.rerun()
+    _render_job(job, title, waiting_message)
+
+
+def prefetch_uploads(uploaded_files: list):
+    """
+    Start extracting new uploads in the background right away, while the
+    user is still picking an output type, and stop that work for files that
+    are removed before anyone uses them.
+    """
+    previous = st.session_state.get("prefetch", {})  # file_id -> extraction key
+    current = {uploaded_file.file_id: uploaded_file for uploaded_file in uploaded_files}
+    if current.keys() == previous.keys():
+        return
+
+    # Document/OCR libraries are only loaded once a file is uploaded
+    from file_processor import cancel_prefetch, prefetch_uploaded_file
+
+    session = current_session()
+    for file_id, key in previous.items():
+        if file_id not in current and key:
+            cancel_prefetch(key, session)
+    st.session_state.prefetch = {
+        file_id: previous[file_id] if file_id in previous else prefetch_uploaded_file(uploaded_file, session)
+        for file_id, uploaded_file in current.items()
+    }
+
+
+def show_job(slot: str, title: str, waiting_message: str):
+    """
+    Show the job started from a slot ("text_job"/"file_job"). Its id lives
+    in the URL, so reruns and page reloads reattach to the same job.
+    """
+    job_id = st.query_params.get(slot)
+    if not job_id:
+        return
+    job = get_job(job_id)
+    if job is None:
+        del st.query_params[slot]
+        return
+
+    if job["status"] in FINISHED:
+        _render_job(job, title, waiting_message)
+        if st.button("✖️ Tutup hasil", key=f"close_{slot}"):
+            del st.query_params[slot]
+            st.rerun()
+    else:
+        _job_progress(job_id, title, waiting_message)
 
 # Page configuration
 st.set_page_config(
@@ -25,329 +158,16 @@ if "dark_mode" not in st.session_state:
     st.session_state.dark_mode = True  # Default to dark mode
 
 # Theme colors based on mode
-if st.session_state.dark_mode:
-    # DARK MODE: CSS Overrides needed
-    bg_color = "#0e1117"
-    card_bg = "#262730"
-    border_color = "#333333"
-    text_color = "#ffffff"
-    text_secondary = "#bbbbbb"
-    
-    accent_primary = "#DC143C"  # Crimson
-    accent_hover = "#b01030"
-    highlight_color = "#DC143C"
-    
-else:
-    # LIGHT MODE: Matches config.toml defaults
-    bg_color = "#ffffff"
-    card_bg = "#f0f4ff"
-    border_color = "#e0e0e0"
-    text_color = "#000000"
-    text_secondary = "#333333"
-    
-    accent_primary = "#0056b3"
-    accent_hover = "#004494"
-    highlight_color = "#FFD700" # Gold
+theme_name = "dark" if st.session_state.dark_mode else "light"
+theme = THEMES[theme_name]
+card_bg = theme["card_bg"]
+text_color = theme["text_color"]
+text_secondary = theme["text_secondary"]
+highlight_color = theme["highlight_color"]
 
+# Custom CSS for clean, flat UI (built once per theme in theme.py)
+st.markdown(THEME_CSS[theme_name], unsafe_allow_html=True)
 
-# Custom CSS for clean, flat UI
-st.markdown(f"""
-<style>
-    /* v1.5 Force Refresh */
-    /* Import Inter Font */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-    
-    /* Base App Styling */
-    .stApp {{
-        background-color: {bg_color};
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-        color: {text_color} !important;
-    }}
-    
-    /* Header Bar - must match background */
-    header[data-testid="stHeader"] {{
-        background-color: {bg_color} !important;
-    }}
-    
-    /* Top toolbar/decoration bar */
-    .stDeployButton, [data-testid="stToolbar"] {{
-        background-color: {bg_color} !important;
-    }}
-    
-    h1, h2, h3, h4, h5, h6, span, div, p, label, .stMarkdown, .stText {{
-        font-family: 'Inter', sans-serif;
-        color: {text_color} !important;
-    }}
-    
-    /* Input Fields (Text Area, Inputs, Selectbox) */
-
-    /* Input Fields (Text Area, Inputs, Selectbox) */
-    .stTextArea textarea, .stTextInput input, .stSelectbox div[data-baseweb="select"] {{
-        background-color: {card_bg} !important;
-        color: {text_color} !important;
-        border: 1px solid {border_color} !important;
-        border-radius: 8px !important;
-        box-shadow: none !important;
-    }}
-    
-    /* Force textarea text color */
-    textarea {{
-        color: {text_color} !important;
-        caret-color: {text_color} !important;
-    }}
-    
-    /* Placeholder text */
-    textarea::placeholder {{
-        color: {text_secondary} !important;
-        opacity: 0.7;
-    }}
-    
-    /* Selectbox dropdown styling */
-    .st-cp, .st-cq, .st-cr, .st-cs {{
-        background-color: {card_bg} !important;
-        color: {text_color} !important;
-    }}
-    
-    /* Stronger Label Selectors */
-    div[data-testid="stMarkdownContainer"] p, 
-    div[data-testid="stMarkdownContainer"] span,
-    label[data-testid="stWidgetLabel"] p {{
-        color: {text_color} !important;
-        font-weight: 500;
-    }}
-    
-    .stTextArea textarea:focus, .stTextInput input:focus {{
-        border-color: {accent_primary} !important;
-        box-shadow: 0 0 0 1px {accent_primary} !important;
-    }}
-
-    /* Tabs - Explicit coloring */
-    button[data-baseweb="tab"] div[data-testid="stMarkdownContainer"] p {{
-        color: {text_secondary} !important;
-    }}
-    
-    button[data-baseweb="tab"][aria-selected="true"] div[data-testid="stMarkdownContainer"] p {{
-        color: {accent_primary} !important;
-        font-weight: 600;
-    }}
-    
-    /* Force Tab Underline Color - hide default, show only theme color */
-    button[data-baseweb="tab"][aria-selected="true"] {{
-        border-bottom: 3px solid {accent_primary} !important;
-    }}
-    
-    /* Hide Streamlit's default blue highlight bar */
-    .stTabs [data-baseweb="tab-highlight"] {{
-        background-color: {accent_primary} !important;
-    }}
-    
-    /* Tabs Container underline */
-    .stTabs [data-baseweb="tab-list"] {{
-        gap: 2rem;
-        background-color: transparent;
-        border-bottom: 1px solid {border_color};
-        padding-bottom: 0;
-    }}
-    
-    /* File Uploader Dropzone - Theme-aware Background */
-    [data-testid="stFileUploaderDropzone"] {{
-        background-color: {card_bg} !important;
-        border: 1px dashed {border_color} !important;
-        border-radius: 8px;
-    }}
-    
-    .st-emotion-cache-12izz8t {{
-        background-color: {card_bg} !important;
-    }}
-    
-    /* Expander Summary - Theme-aware Background */
-    .st-emotion-cache-gsdrzw, summary {{
-        background-color: {card_bg} !important;
-        border-radius: 8px;
-        padding: 0.5rem;
-    }}
-    section[data-testid="stSidebar"] {{
-        background-color: {bg_color};
-        border-right: 1px solid {border_color};
-    }}
-    
-    section[data-testid="stSidebar"] h1, section[data-testid="stSidebar"] h2, section[data-testid="stSidebar"] h3 {{
-        color: {text_color} !important;
-    }}
-    
-    section[data-testid="stSidebar"] p, section[data-testid="stSidebar"] span, section[data-testid="stSidebar"] li {{
-        color: {text_secondary} !important;
-    }}
-    
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {{
-        gap: 2rem;
-        background-color: transparent;
-        border-bottom: 1px solid {border_color};
-        padding-bottom: 0;
-    }}
-    
-    .stTabs [data-baseweb="tab"] {{
-        background-color: transparent;
-        border: none;
-        color: {text_secondary};
-        padding-bottom: 10px;
-    }}
-    
-    .stTabs [aria-selected="true"] {{
-        background-color: transparent !important;
-        color: {accent_primary} !important;
-        font-weight: 600;
-        border-bottom: 2px solid {accent_primary};
-    }}
-    
-    /* Main Header - Clean & Simple */
-    .main-header {{
-        padding: 2rem 0;
-        margin-bottom: 2rem;
-        border-bottom: 1px solid {border_color};
-    }}
-    
-    .main-header h1 {{
-        color: {accent_primary};
-        font-weight: 700;
-        letter-spacing: -0.02em;
-        margin-bottom: 0.5rem;
-    }}
-    
-    .main-header p {{
-        color: {text_secondary};
-        font-size: 1.1rem;
-    }}
-    
-    /* Primary Buttons */
-    .stButton > button {{
-        background-color: {accent_primary} !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        padding: 0.6rem 1.5rem !important;
-        font-weight: 500 !important;
-        box-shadow: none !important;
-        transition: background-color 0.2s;
-    }}
-    
-    .stButton > button:hover {{
-        background-color: {accent_hover} !important;
-    }}
-    
-    /* File Uploader */
-    [data-testid="stFileUploader"] {{
-        background-color: {card_bg};
-        border: 1px dashed {border_color};
-        border-radius: 8px;
-        padding: 20px;
-    }}
-    
-    /* Result Container */
-    .result-container {{
-        background-color: {card_bg};
-        border: 1px solid {border_color};
-        border-left: 6px solid {highlight_color}; /* Gold in Light Mode */
-        border-radius: 8px;
-        padding: 2rem;
-        margin-top: 1.5rem;
-    }}
-    
-    .result-container * {{
-        color: {text_color} !important;
-    }}
-    
-    .result-container code {{
-        background-color: {bg_color} !important;
-        border: 1px solid {border_color};
-        color: {accent_primary} !important;
-        border-radius: 4px;
-        padding: 2px 5px;
-    }}
-    
-    /* Donation Box - Outline Style */
-    .donation-box {{
-        border: 2px solid {highlight_color}; /* Gold Border */
-        background-color: {card_bg};
-        border-radius: 12px;
-        padding: 1.5rem;
-        text-align: center;
-        margin-top: 2rem;
-    }}
-    
-    .donation-box h3 {{
-        font-size: 1rem;
-        margin-bottom: 0.5rem;
-        color: {text_color};
-    }}
-    
-    .donation-box p {{
-        font-size: 0.85rem;
-        color: {text_secondary};
-        margin-bottom: 1rem;
-    }}
-    
-    .donation-btn {{
-        display: inline-block;
-        background-color: transparent;
-        color: {accent_primary} !important;
-        border: 1px solid {accent_primary};
-        padding: 0.5rem 1.5rem;
-        border-radius: 6px;
-        text-decoration: none;
-        font-weight: 500;
-        font-size: 0.9rem;
-        transition: all 0.2s;
-    }}
-    
-    .donation-btn:hover {{
-        background-color: {accent_primary};
-        color: white !important;
-    }}
-    
-    /* History Items */
-    .history-item {{
-        padding: 0.8rem;
-        border-bottom: 1px solid {border_color};
-    }}
-    
-    .history-item:last-child {{
-        border-bottom: none;
-    }}
-    
-    .history-item strong {{
-        display: block;
-        font-size: 0.9rem;
-        margin-bottom: 0.2rem;
-        color: {text_color};
-    }}
-    
-    .history-item small {{
-        font-size: 0.75rem;
-        color: {text_secondary};
-    }}
-    
-    /* Expander */
-    .streamlit-expanderHeader {{
-        background-color: transparent !important;
-        color: {text_color} !important;
-        border: 1px solid {border_color};
-        border-radius: 8px;
-    }}
-    
-    /* Alerts/Success */
-    .stAlert {{
-        background-color: {card_bg};
-        border: 1px solid {border_color};
-        color: {text_color};
-    }}
-    
-    /* Hide Default Branding */
-    #MainMenu {{visibility: hidden;}}
-    footer {{visibility: hidden;}}
-</style>
-""", unsafe_allow_html=True)
 
 # Sidebar
 with st.sidebar:
@@ -389,7 +209,44 @@ with st.sidebar:
     
     # History section
     st.markdown("### 📜 Recent History")
-    history = get_prompt_history(10)
+    if "history_pages" not in st.session_state:
+        st.session_state.history_pages = 1
+
+    search_query = st.text_input(
+        "Cari riwayat",
+        placeholder="🔎 Cari topik atau isi...",
+        key="history_search",
+        label_visibility="collapsed"
+    )
+
+    history_type = st.selectbox(
+        "Filter",
+        options=["all", "outline", "code", "essay", "summary", "notes", "quiz"],
+        key="history_type",
+        label_visibility="collapsed",
+        on_change=lambda: st.session_state.update(history_pages=1)
+    )
+    history_filter = None if history_type == "all" else history_type
+
+    history = []
+    has_more = False
+    if search_query.strip():
+        history = search_prompts(search_query, HISTORY_PAGE_SIZE, generation_type=history_filter)
+    else:
+        # Walk the keyset pages the user has loaded so far
+        before_id = None
+        for _ in range(st.session_state.history_pages):
+            page = get_prompt_history(
+                HISTORY_PAGE_SIZE,
+                before_id=before_id,
+                generation_type=history_filter
+            )
+            history.extend(page)
+            has_more = len(page) == HISTORY_PAGE_SIZE
+            if not has_more:
+                break
+            before_id = page[-1]["id"]
+
     if history:
         for i, item in enumerate(history):
             type_emoji = {
@@ -402,8 +259,16 @@ with st.sidebar:
             
             # Create a button for each history item
             if st.button(f"{type_emoji} {display_topic}", key=f"history_{item['id']}", use_container_width=True):
-                st.session_state.selected_history = item
+                st.session_state.selected_history = item["id"]
                 st.rerun()
+            if item.get("snippet"):
+                st.caption(" ".join(item["snippet"].split()))
+
+        if has_more and st.button("⬇️ Muat lebih banyak", key="history_more", use_container_width=True):
+            st.session_state.history_pages += 1
+            st.rerun()
+    elif search_query.strip():
+        st.info("Tidak ada hasil yang cocok.")
     else:
         st.info("No history yet. Start generating!")
 
@@ -416,9 +281,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Show selected history item as a modal-like popup in main area
+selected = None
 if "selected_history" in st.session_state and st.session_state.selected_history:
-    selected = st.session_state.selected_history
-    
+    # Only the item being viewed has its response body loaded
+    selected = get_prompt(st.session_state.selected_history)
+
+if selected:
     # Create a prominent container for history view
     st.markdown(f"""
     <div style="
@@ -479,17 +347,24 @@ with tab1:
             }[x],
             key="text_gen_type"
         )
+        force_regenerate = st.checkbox(
+            "🔄 Generate ulang",
+            help="Abaikan jawaban tersimpan untuk topik yang sama dan minta jawaban baru dari AI",
+            key="force_regenerate"
+        )
 
 with tab2:
     # File upload section
     st.markdown("### 📁 Upload File untuk Dianalisis")
     st.caption("Mendukung: PDF, PowerPoint (PPTX), Gambar (PNG, JPG), Screenshot, dan tulisan tangan")
     
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Pilih file",
         type=["pdf", "pptx", "ppt", "png", "jpg", "jpeg", "gif", "bmp", "webp"],
-        help="Upload dokumen PDF, presentasi PPT, atau gambar untuk dianalisis"
+        accept_multiple_files=True,
+        help="Upload dokumen PDF, presentasi PPT, atau gambar untuk dianalisis. Beberapa file digabung jadi satu hasil."
     )
+    prefetch_uploads(uploaded_files)
     
     file_generation_type = st.selectbox(
         "🎯 Tipe output untuk file",
@@ -503,89 +378,44 @@ with tab2:
         key="file_gen_type"
     )
     
-    if uploaded_file is not None:
+    if uploaded_files:
         # Show file info
-        st.success(f"✅ File uploaded: {uploaded_file.name} ({uploaded_file.size / 1024:.1f} KB)")
-        
+        total_kb = sum(uploaded_file.size for uploaded_file in uploaded_files) / 1024
+        if len(uploaded_files) == 1:
+            st.success(f"✅ File uploaded: {uploaded_files[0].name} ({total_kb:.1f} KB)")
+        else:
+            st.success(f"✅ {len(uploaded_files)} files uploaded ({total_kb:.1f} KB)")
+            for uploaded_file in uploaded_files:
+                st.caption(f"📎 {uploaded_file.name} ({uploaded_file.size / 1024:.1f} KB)")
+
         # Preview for images
-        if uploaded_file.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-            st.image(uploaded_file, caption="Preview", width=300)
-        
+        images = [
+            uploaded_file for uploaded_file in uploaded_files
+            if uploaded_file.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'))
+        ]
+        if images:
+            st.image(images, caption=[image.name for image in images], width=300 if len(images) == 1 else 150)
+
         if st.button("📖 Proses & Generate", use_container_width=True):
-            with st.spinner("📄 Mengekstrak teks dari file..."):
-                extracted_text, file_type = process_uploaded_file(uploaded_file)
-                
-                if extracted_text and not extracted_text.startswith("Error"):
-                    st.info(f"📋 Teks dari {file_type} berhasil diekstrak ({len(extracted_text)} karakter)")
-                    
-                    with st.expander("👁️ Preview Teks yang Diekstrak"):
-                        st.text_area("Extracted Text", extracted_text[:2000] + ("..." if len(extracted_text) > 2000 else ""), height=200)
-                    
-                    # Generate based on extracted text
-                    with st.spinner("🔮 AI sedang menganalisis..."):
-                        try:
-                            # Create prompt based on generation type
-                            prompts = {
-                                "summary": f"Buatkan ringkasan singkat dan jelas dari materi berikut dalam Bahasa Indonesia:\n\n{extracted_text}",
-                                "outline": f"Buatkan outline/kerangka materi dari dokumen berikut untuk memudahkan belajar:\n\n{extracted_text}",
-                                "notes": f"Buatkan catatan belajar yang terstruktur dari materi berikut, dengan poin-poin penting:\n\n{extracted_text}",
-                                "quiz": f"Buatkan 5-10 soal latihan beserta jawabannya berdasarkan materi berikut:\n\n{extracted_text}"
-                            }
-                            
-                            result = generate_content(prompts[file_generation_type], "outline")
-                            
-                            # Save to database
-                            save_prompt(f"[{file_type}] {uploaded_file.name}", file_generation_type, result)
-                            
-                            # Display result
-                            st.markdown("### 🎉 Hasil Analisis")
-                            st.markdown(f"""
-                            <div class="result-container">
-                                {result}
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            with st.expander("📖 Lihat dalam format Markdown", expanded=True):
-                                st.markdown(result)
-                            
-                            st.success("✅ Hasil disimpan ke database!")
-                            
-                        except Exception as e:
-                            st.error(f"⚠️ Error: {str(e)}")
-                else:
-                    st.error(f"⚠️ {extracted_text}")
+            st.query_params["file_job"] = submit_job(
+                "file", ", ".join(uploaded_file.name for uploaded_file in uploaded_files), file_generation_type,
+                run_file_analysis, list(uploaded_files), file_generation_type
+            )
+
+    # Outside the upload check: a running analysis outlives the uploaded file
+    show_job("file_job", "Hasil Analisis", "🔮 AI sedang menganalisis...")
 
 # Generate button
 if st.button("✨ Generate dengan Kimi K2", use_container_width=True):
     if not topic.strip():
         st.error("⚠️ Masukkan topik terlebih dahulu!")
     else:
-        with st.spinner("🔮 AI sedang membuat konten untukmu..."):
-            try:
-                result = generate_content(topic, generation_type)
-                
-                # Save to database
-                save_prompt(topic, generation_type, result)
-                
-                # Display result with proper styling
-                st.markdown("### 🎉 Hasil Generate")
-                st.markdown(f"""
-                <div class="result-container">
-                    {result}
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Also show in proper markdown format
-                with st.expander("📖 Lihat dalam format Markdown", expanded=True):
-                    st.markdown(result)
-                
-                st.success("✅ Hasil disimpan ke database!")
-                
-            except ValueError as e:
-                st.error(f"⚠️ Error: {str(e)}")
-                st.info("💡 Pastikan Ollama sudah berjalan dan terhubung ke cloud")
-            except Exception as e:
-                st.error(f"⚠️ Terjadi kesalahan: {str(e)}")
+        st.query_params["text_job"] = submit_job(
+            "generate", topic, generation_type,
+            run_generation, topic, generation_type, force_regenerate
+        )
+
+show_job("text_job", "Hasil Generate", "🔮 AI sedang membuat konten untukmu...")
 
 # Footer
 st.markdown("---")
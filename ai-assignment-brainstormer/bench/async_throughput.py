@@ -0,0 +1,128 @@
+# Benchmark: throughput of concurrent non-streamed generations, blocking
+# threads vs the asyncio path
+#
+#   python bench/async_throughput.py
+#   python bench/async_throughput.py --requests 200 --connections 100
+#
+# A stub (bench/stub_server.py, in its own process so its threads are not
+# counted) answers every request after --latency seconds. Modes:
+#   threads+sync   a thread per request, each blocking on the shared sync
+#                  client (how generate_content_ai used to make its call)
+#   threads        a thread per request calling generate_content_ai, which
+#                  waits on the background event loop
+#   asyncio        one asyncio.gather over agenerate_content_ai
+# --connections sets HTTP_MAX_CONNECTIONS, HTTP_KEEPALIVE_CONNECTIONS and
+# ASYNC_MAX_CONCURRENCY (they are read on import). The first round opens
+# new connections, later ones reuse them, so best and worst are shown.
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+MODES = ["threads+sync", "threads", "asyncio"]
+
+
+class PeakThreads:
+    """Highest threading.active_count() seen while the block runs."""
+
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(0.005):
+            self.peak = max(self.peak, threading.active_count() - 1)  # not counting the sampler
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+
+def start_stub_process(latency: float) -> tuple:
+    """Run bench/stub_server.py on a free port; returns (process, base_url)."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "stub_server.py"),
+         "--port", str(port), "--delay", str(latency), "--tokens", "1"],
+        stdout=subprocess.PIPE, text=True
+    )
+    process.stdout.readline()  # "serving ..." once it listens
+    return process, f"http://localhost:{port}/v1"
+
+
+def run(mode: str, requests: int, label: str) -> list:
+    import kimi_api
+
+    prompts = [f"halo {label} {number}" for number in range(requests)]  # distinct, so none are coalesced
+    if mode == "asyncio":
+        async def gather():
+            return await asyncio.gather(*(kimi_api.agenerate_content_ai(prompt, "stub") for prompt in prompts))
+        return asyncio.run(gather())
+
+    if mode == "threads+sync":
+        def call(prompt):
+            client, model = kimi_api.get_client()
+            response = client.chat.completions.create(
+                model=model, messages=[{"role": "system", "content": "stub"}, {"role": "user", "content": prompt}]
+            )
+            return response.choices[0].message.content
+    else:
+        def call(prompt):
+            return kimi_api.generate_content_ai(prompt, "stub")
+    with ThreadPoolExecutor(requests) as pool:
+        return list(pool.map(call, prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocking threads vs asyncio for concurrent generations")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the stub takes per answer")
+    parser.add_argument("--connections", type=int, help="connection and concurrency limits (default: the app's)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    if args.connections:
+        for name in ("HTTP_MAX_CONNECTIONS", "HTTP_KEEPALIVE_CONNECTIONS", "ASYNC_MAX_CONCURRENCY"):
+            os.environ[name] = str(args.connections)
+    import kimi_api
+    import rate_limiter
+
+    rate_limiter.PROVIDER_RATE_LIMITS["localhost"] = (10 ** 6, None, False)
+    stub, base_url = start_stub_process(args.latency)
+    kimi_api.get_api_config = lambda: {"api_key": "stub", "base_url": base_url, "model": "stub"}
+    try:
+        print(f"{args.requests} requests, stub latency {args.latency:g}s, {kimi_api.HTTP_MAX_CONNECTIONS} "
+              f"connections, {kimi_api.ASYNC_MAX_CONCURRENCY} async generations at once")
+        print(f"{'mode':<13} {'best s':>7} {'worst s':>7} {'best req/s':>10} {'peak threads':>12}")
+        for mode in args.modes:
+            run(mode, 1, f"{mode} warm-up")  # imports, connects, starts the loop
+            timings, peak = [], 0
+            for number in range(args.rounds):
+                with PeakThreads() as threads:
+                    start = time.perf_counter()
+                    run(mode, args.requests, f"{mode} {number}")
+                    timings.append(time.perf_counter() - start)
+                peak = max(peak, threads.peak)
+            print(f"{mode:<13} {min(timings):>7.2f} {max(timings):>7.2f} {args.requests / min(timings):>10.0f} "
+                  f"{peak:>12}")
+            kimi_api.reset_clients()  # the next mode starts without open connections
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Benchmark: request latency with a new API client per call vs the cached
+# client from get_client(), over http and https
+#
+#   python bench/client_reuse.py
+#   python bench/client_reuse.py --calls 300 --schemes https
+#
+# Sequential streamed calls (generate_content_ai_stream, which uses
+# get_client) to a local stub that answers at once, so the numbers are the
+# client's own overhead: building the client (loading the CA bundle), TCP
+# connect and TLS handshake.
+# https needs the openssl CLI for a throwaway certificate.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import kimi_api  # noqa: E402
+import rate_limiter  # noqa: E402
+from stub_server import self_signed_cert, start_stub  # noqa: E402
+
+
+def trust_bundle(cert: str, directory: str) -> str:
+    """certifi's CA bundle plus cert, so a new client loads as many CAs as it would in production."""
+    import certifi
+
+    path = os.path.join(directory, "bundle.pem")
+    with open(path, "w") as bundle:
+        for source in (certifi.where(), cert):
+            with open(source) as f:
+                bundle.write(f.read())
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call vs cached API client latency")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--schemes", nargs="+", choices=["http", "https"], default=["http", "https"])
+    args = parser.parse_args()
+
+    from openai import OpenAI
+
+    rate_limiter.PROVIDER_RATE_LIMITS["localhost"] = (10 ** 6, None, False)
+    cached_client = kimi_api.get_client
+    print(f"{args.calls} sequential calls")
+    print(f"{'scheme':<6} {'client':<16} {'p50 ms':>7} {'p95 ms':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for scheme in args.schemes:
+            tls = None
+            if scheme == "https":
+                tls = self_signed_cert(directory)
+                os.environ["SSL_CERT_FILE"] = trust_bundle(tls[0], directory)  # read when a client is built
+            server, base_url = start_stub(tls=tls, tokens=5)
+            config = {"api_key": "stub", "base_url": base_url, "model": "stub"}
+            kimi_api.get_api_config = lambda: config
+
+            def per_call_client():
+                # What every request did before clients were cached
+                return OpenAI(api_key=config["api_key"], base_url=config["base_url"]), config["model"]
+
+            for name, get_client in (("per-call client", per_call_client), ("cached client", cached_client)):
+                kimi_api.get_client = get_client
+                latencies = []
+                for number in range(args.calls + 1):
+                    start = time.perf_counter()
+                    "".join(kimi_api.generate_content_ai_stream(f"halo {number}", "stub"))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                latencies = sorted(latencies[1:])  # the first call also imports and warms up
+                print(f"{scheme:<6} {name:<16} {statistics.median(latencies):>7.2f} "
+                      f"{latencies[int(0.95 * len(latencies)) - 1]:>7.2f}")
+            kimi_api.get_client = cached_client
+            kimi_api.reset_clients()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Benchmark: cold start of the app, import time and script run timings
+#
+#   python bench/cold_start.py
+#   python bench/cold_start.py --reruns 50 --toggles 20
+#
+# Import times come from `python -X importtime` importing what app.py
+# imports. Script runs use Streamlit's AppTest in a fresh interpreter: the
+# first run (imports, database setup, first render), plain reruns, and
+# reruns after clicking the theme toggle. The app uses a temporary database,
+# never prompts.db.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP_MODULES = ["streamlit", "database", "kimi_api", "jobs", "rate_limiter", "theme"]
+# Only needed once a request is sent or a file uploaded; a cold start should not load them
+HEAVY_MODULES = ["openai", "httpx", "PIL", "pytesseract", "PyPDF2", "pptx", "docx"]
+
+
+def import_times() -> tuple:
+    """
+    ({module: ms}, wall ms of the interpreter). A module's time only covers
+    what the modules before it in APP_MODULES had not imported already.
+    """
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(APP_MODULES)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    wall = (time.perf_counter() - start) * 1000
+    cumulative = {}
+    for line in stderr.splitlines():
+        # "import time:  self | cumulative | name", nested imports indented further
+        if line.count("|") != 2:
+            continue  # warnings printed while importing
+        _, total, name = line.split("|")
+        if total.strip().isdigit() and not name.startswith("  "):
+            cumulative[name.strip()] = int(total) / 1000
+    return cumulative, wall
+
+
+def run_app(reruns: int, toggles: int) -> dict:
+    """AppTest timings in this (fresh) process; called in the child interpreter."""
+    sys.path.insert(0, APP_DIR)
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import database
+    streamlit_import = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.DB_PATH = Path(directory) / "prompts.db"
+        app = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=60)
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+        rerun_times = []
+        for _ in range(reruns):
+            start = time.perf_counter()
+            app.run()
+            rerun_times.append(time.perf_counter() - start)
+
+        toggle_times = []
+        for _ in range(toggles):
+            toggle = next(button for button in app.button if "Toggle" in button.label)
+            start = time.perf_counter()
+            toggle.click().run()
+            toggle_times.append(time.perf_counter() - start)
+        database.close_connections()
+
+    return {
+        "streamlit_import": streamlit_import * 1000,
+        "first": first * 1000,
+        "rerun": statistics.median(rerun_times) * 1000,
+        "toggle": statistics.median(toggle_times) * 1000,
+        "heavy": loaded
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App cold start: imports and script runs")
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--toggles", type=int, default=10)
+    parser.add_argument("--run-app", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_app:
+        print(json.dumps(run_app(args.reruns, args.toggles)))
+        return
+
+    cumulative, wall = import_times()
+    print(f"importing the app's modules: {wall:.0f} ms of interpreter wall time")
+    for name in APP_MODULES:
+        print(f"  {name:<14} {cumulative.get(name, 0):>7.1f} ms")
+
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-app",
+         "--reruns", str(args.reruns), "--toggles", str(args.toggles)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    print(f"AppTest import           {result['streamlit_import']:>7.0f} ms")
+    print(f"first run                {result['first']:>7.0f} ms")
+    print(f"rerun (median)           {result['rerun']:>7.1f} ms")
+    print(f"theme toggle (median)    {result['toggle']:>7.1f} ms")
+    print(f"heavy modules after first run: {', '.join(result['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Benchmark: per-call latency and throughput of the prompts database with
+# pooled connections vs a new connection per call
+#
+#   python bench/db_pool.py
+#   python bench/db_pool.py --sessions 1 8 32 --calls 200
+#
+# Each session is a thread making the calls a Streamlit session makes: 10%
+# save_prompt, 90% get_prompt_history(10). Runs on a temporary database,
+# never the app's prompts.db.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import database  # noqa: E402
+
+SEED_ROWS = 200
+RESPONSE = "Outline tugas: pendahuluan, tinjauan pustaka, metode, hasil, kesimpulan. " * 30
+
+
+@contextmanager
+def unpooled_connection():
+    """get_connection without the pool: connect, use once, close."""
+    conn = database._connect()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def run(sessions: int, calls: int) -> tuple:
+    """Returns (sorted latencies in seconds, wall seconds)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def session():
+        local = []
+        for number in range(calls):
+            start = time.perf_counter()
+            if number % 10 == 0:
+                database.save_prompt("topik benchmark", "code", RESPONSE)
+            else:
+                database.get_prompt_history(10)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pooled vs per-call database connections")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--calls", type=int, default=200, help="calls per session")
+    args = parser.parse_args()
+
+    pooled_connection = database.get_connection
+    print(f"pool size {database.POOL_SIZE}, {args.calls} calls per session")
+    print(f"{'sessions':>8}  {'connections':<11}  {'p50 ms':>7}  {'p95 ms':>7}  {'calls/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        database.DB_PATH = Path(directory) / "prompts.db"
+        database.init_db()
+        for number in range(SEED_ROWS):
+            database.save_prompt(f"topik {number}", "outline", RESPONSE)
+        for sessions in args.sessions:
+            for name, connection in (("per call", unpooled_connection), ("pooled", pooled_connection)):
+                database.get_connection = connection
+                latencies, wall = run(sessions, args.calls)
+
+                def percentile(fraction):
+                    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+                print(f"{sessions:>8}  {name:<11}  {percentile(0.5):>7.3f}  {percentile(0.95):>7.3f}  "
+                      f"{len(latencies) / wall:>8,.0f}")
+        database.get_connection = pooled_connection
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
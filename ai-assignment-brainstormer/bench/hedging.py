@@ -0,0 +1,106 @@
+# Benchmark: request latency of sequential fallback vs hedged requests when
+# models are slow or failing
+#
+#   python bench/hedging.py
+#   python bench/hedging.py --requests 400 --users 8
+#
+# A local stub injects each model's latency and 503s (MODELS). Requests run
+# from --users threads at once, each with its own prompt so none are
+# coalesced. Router ordering is disabled and client retries are off, so the
+# numbers show the hedging alone.
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import kimi_api  # noqa: E402
+import model_router  # noqa: E402
+import rate_limiter  # noqa: E402
+from stub_server import StubHandler, start_stub  # noqa: E402
+
+# Fallback order -> (latency, failure probability, seconds before the 503)
+MODELS = {
+    "a": (0.6, 0.3, 1.5),  # usually fast, but 30% fail slowly
+    "b": (0.8, 0.2, 0.1),  # 20% fail at once
+    "c": (0.5, 0.1, 0.8),
+    "d": (1.0, 0.0, 0.0),  # slow but always answers
+}
+
+# name -> (hedged, HEDGE_DELAY, HEDGE_IMMEDIATE, every request from one user)
+CONFIGS = [
+    ("sequential", False, None, None, False),
+    ("hedged, delay 0.3s", True, 0.3, 1, False),
+    ("hedged, top-2 + 0.3s", True, 0.3, 2, False),
+    ("hedged, 1 shared budget", True, 0.3, 2, True),
+]
+
+
+class CountingHandler(StubHandler):
+    calls = []  # one entry per request; replaced for every stub
+
+    def do_POST(self):
+        self.calls.append(1)
+        super().do_POST()
+
+
+def without_retries(build):
+    return lambda config: build(config).with_options(max_retries=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential fallback vs hedged requests")
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--users", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    kimi_api.print = model_router.print = lambda *a, **k: None  # keep failure log lines out of the table
+    rate_limiter.PROVIDER_RATE_LIMITS["localhost"] = (10 ** 6, None, False)
+    kimi_api.MODEL_LIST = list(MODELS)
+    kimi_api._models_to_try = lambda client, primary_model: list(kimi_api.MODEL_LIST)
+    kimi_api._build_client = without_retries(kimi_api._build_client)
+    kimi_api._build_async_client = without_retries(kimi_api._build_async_client)
+
+    print(f"{args.requests} requests, {args.users} at once")
+    print(f"{'config':<24} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'max s':>6}  model calls")
+    for name, hedged, delay, immediate, shared in CONFIGS:
+        server, base_url = start_stub(faults=MODELS, seed=args.seed, handler=CountingHandler)
+        server.RequestHandlerClass.calls = calls = []
+        model_router._router = None  # every config starts with fresh model stats
+        config = {"api_key": "stub", "base_url": base_url, "model": "a"}
+        kimi_api.get_api_config = lambda: config
+        kimi_api.HEDGE_REQUESTS = False
+        if hedged:
+            kimi_api.HEDGE_DELAY, kimi_api.HEDGE_IMMEDIATE = delay, immediate
+
+        def one(number):
+            prompt = f"halo {name} {number}"
+            start = time.perf_counter()
+            try:
+                if hedged:
+                    user = "shared" if shared else threading.current_thread().name
+                    kimi_api.generate_content_ai_hedged(prompt, "stub", user=user)
+                else:
+                    kimi_api.generate_content_ai(prompt, "stub")
+            except ValueError:
+                pass  # every model failed: counts with the time it took
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(args.users) as pool:
+            latencies = sorted(pool.map(one, range(args.requests)))
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        print(f"{name:<24} {statistics.median(latencies):>6.2f} {percentile(0.95):>6.2f} "
+              f"{percentile(0.99):>6.2f} {latencies[-1]:>6.2f}  {len(calls)}")
+        kimi_api.reset_clients()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: OCR wall time, peak RSS and character accuracy with and without
+# image preprocessing, against the ground-truth set in bench/fixtures/ocr
+#
+#   python bench/ocr_preprocess.py
+#   python bench/ocr_preprocess.py photo.jpg     # expects photo.txt next to it
+#
+# Each image/pipeline pair runs in a fresh interpreter so peak RSS is not
+# carried over between runs. Peak RSS covers that interpreter and the
+# tesseract process it starts (the larger of the two).
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, "fixtures", "ocr")
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+PIPELINES = ["none", "default", "deskew"]
+
+
+def _steps(pipeline: str):
+    import file_processor as fp
+    if pipeline == "none":
+        return []  # the image goes to tesseract exactly as uploaded
+    if pipeline == "deskew":
+        return [fp.downscale_to_dpi, fp.fix_orientation, fp.to_grayscale, fp.deskew, fp.binarize]
+    return None  # OCR_PREPROCESS_STEPS
+
+
+def run_one(pipeline: str, path: str) -> dict:
+    """OCR one image in this process; called in the child interpreter."""
+    import pytesseract
+    from PIL import Image
+    from file_processor import preprocess_image
+    from ocr_engine import OCR_LANG
+
+    start = time.perf_counter()
+    image = preprocess_image(Image.open(path), _steps(pipeline))
+    prepared = time.perf_counter()
+    text = pytesseract.image_to_string(image, lang=OCR_LANG)
+    done = time.perf_counter()
+    return {
+        "preprocess": prepared - start,
+        "wall": done - start,
+        # ru_maxrss is in KiB on Linux
+        "rss": max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024,
+        "text": text
+    }
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(text: str, truth: str) -> float:
+    """1 - character error rate, with runs of whitespace counted as one space."""
+    text, truth = " ".join(text.split()), " ".join(truth.split())
+    return max(0.0, 1 - edit_distance(text, truth) / max(1, len(truth)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR with and without preprocessing")
+    parser.add_argument("images", nargs="*", help="images with a ground-truth .txt beside them")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--run", nargs=2, metavar=("PIPELINE", "IMAGE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_one(*args.run)))
+        return
+
+    images = args.images or sorted(
+        path for path in glob.glob(os.path.join(FIXTURES, "*")) if not path.endswith(".txt")
+    )
+    print(f"{'image':<18} {'pipeline':<8} {'wall s':>7} {'prep s':>7} {'peak MB':>7} {'accuracy':>8}")
+    for path in images:
+        with open(os.path.splitext(path)[0] + ".txt", encoding="utf-8") as f:
+            truth = f.read()
+        for pipeline in args.pipelines:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", pipeline, path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f"{os.path.basename(path):<18} {pipeline:<8} {result['wall']:>7.2f} {result['preprocess']:>7.2f} "
+                  f"{result['rss']:>7.0f} {char_accuracy(result['text'], truth):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
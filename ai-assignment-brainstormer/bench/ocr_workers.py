@@ -0,0 +1,86 @@
+# Benchmark: OCR wall time of multi-page scans at different worker counts
+#
+#   python bench/ocr_workers.py                     # synthetic A4 scans
+#   python bench/ocr_workers.py scan.tiff --workers 1 2 4
+#
+# Every page is OCR'd through OCREngine exactly as uploads are; the pool is
+# warmed up before timing so worker start-up is not counted.
+import argparse
+import os
+import sys
+import time
+from PIL import Image, ImageDraw, ImageFont, ImageSequence
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ocr_engine import OCREngine  # noqa: E402
+
+PAGE_SIZE = (2480, 3508)  # A4 at 300 DPI
+TEXT = (
+    "Manajemen proyek perangkat lunak mencakup perencanaan, penjadwalan dan "
+    "pengendalian sumber daya. The waterfall model completes each phase before "
+    "the next one starts, while agile teams deliver working software in short "
+    "iterations and revise the plan after every sprint review."
+)
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)  # Pillow >= 10.1
+
+
+def synthetic_page(number: int) -> Image.Image:
+    """A grayscale A4 page of body text, like a flatbed scan."""
+    page = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    font = _font(42)
+    draw.text((200, 150), f"Halaman {number}", font=font, fill=0)
+    words = (TEXT + " ") * 12
+    line, y = "", 300
+    for word in words.split():
+        if draw.textlength(line + word, font=font) > PAGE_SIZE[0] - 400:
+            draw.text((200, y), line, font=font, fill=0)
+            line, y = "", y + 64
+            if y > PAGE_SIZE[1] - 200:
+                break
+        line += word + " "
+    return page
+
+
+def load_pages(paths: list) -> list:
+    pages = []
+    for path in paths:
+        with Image.open(path) as image:
+            pages.extend(frame.convert("L") for frame in ImageSequence.Iterator(image))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR wall time at different worker counts")
+    parser.add_argument("images", nargs="*", help="scanned images (multi-frame TIFFs count every page)")
+    parser.add_argument("--pages", type=int, default=8, help="synthetic pages when no images are given")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    pages = load_pages(args.images) if args.images else [synthetic_page(i + 1) for i in range(args.pages)]
+    print(f"{len(pages)} pages, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7}  {'wall s':>7}  {'pages/s':>7}  {'speedup':>7}  chars")
+
+    baseline = None
+    for workers in args.workers:
+        engine = OCREngine(workers=workers).start()
+        try:
+            engine.ocr_pages([Image.new("L", (200, 50), 255)] * workers)  # spawn every worker
+            start = time.perf_counter()
+            texts = engine.ocr_pages(pages)
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.shutdown()
+        baseline = baseline or elapsed
+        print(f"{workers:>7}  {elapsed:>7.2f}  {len(pages) / elapsed:>7.2f}  {baseline / elapsed:>6.2f}x  "
+              f"{sum(len(text) for text in texts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Simulation: request latency of fixed-order model fallback vs ModelRouter
+#
+#   python bench/router_sim.py
+#   python bench/router_sim.py --requests 10000 --seed 3
+#
+# A fake provider answers on a virtual clock, so thousands of requests take
+# a second. Each request walks the fallback list the way generate_content_ai
+# does: the first model to answer wins, every attempt's outcome and duration
+# is reported to the router.
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import model_router  # noqa: E402
+from kimi_api import MODEL_LIST  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+
+THINK_TIME = 5.0  # virtual seconds between requests
+OUTAGE = (1000, 1500)  # requests during which deepseek-r1 only returns 500s
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider:
+    """Models with their own latency, error rate and error cost (seconds lost per failure)."""
+
+    def __init__(self, seed: int):
+        self.rnd = random.Random(seed)
+        self.now = 0.0
+        self.outage = False
+        lognormal = self.rnd.lognormvariate
+        # model -> (failure probability, failure status, failure cost, latency)
+        self.profiles = {model: (0.05, 500, 2.0, lambda: lognormal(1.5, 0.5)) for model in MODEL_LIST}
+        self.profiles.update({
+            "deepseek/deepseek-r1:free": (0.0, 500, 5.0, lambda: lognormal(2.6, 0.4)),  # slow reasoning model, ~13 s
+            "deepseek/deepseek-chat:free": (0.6, 429, 1.5, lambda: lognormal(1.6, 0.3)),  # rate-limited most of the time
+            "qwen/qwen-2-7b-instruct:free": (0.0, 500, 2.0, lambda: lognormal(1.1, 0.3)),  # ~3 s
+        })
+
+    def call(self, model: str):
+        probability, status, cost, latency = self.profiles[model]
+        if self.outage and model == "deepseek/deepseek-r1:free":
+            probability = 1.0
+        if self.rnd.random() < probability:
+            self.now += cost
+            raise ProviderError(status)
+        self.now += latency()
+
+
+def simulate(use_router: bool, requests: int, seed: int) -> tuple:
+    """Run the request stream; returns (sorted request latencies, router)."""
+    provider = FakeProvider(seed)
+    router = ModelRouter(clock=lambda: provider.now)
+    latencies = []
+    for number in range(requests):
+        provider.outage = OUTAGE[0] <= number < OUTAGE[1]
+        start = provider.now
+        for model in router.rank(MODEL_LIST) if use_router else MODEL_LIST:
+            attempt = provider.now
+            try:
+                provider.call(model)
+            except ProviderError as e:
+                router.record_failure(model, e)
+                continue
+            router.record_success(model, provider.now - attempt)
+            break
+        latencies.append(provider.now - start)
+        provider.now += THINK_TIME
+    return sorted(latencies), router
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-order fallback vs ModelRouter on a fake provider")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    model_router.print = lambda *a, **k: None  # keep breaker log lines out of the table
+    print(f"{args.requests} requests, deepseek-r1 down for requests {OUTAGE[0]}-{OUTAGE[1]}")
+    for name, use_router in (("fixed order", False), ("router", True)):
+        latencies, router = simulate(use_router, args.requests, args.seed)
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        print(f"{name:<12} p50 {percentile(0.5):5.1f}s  p95 {percentile(0.95):5.1f}s  "
+              f"p99 {percentile(0.99):5.1f}s  mean {statistics.mean(latencies):5.1f}s")
+        if use_router:
+            for model, stats in router.snapshot().items():
+                if stats["calls"]:
+                    print(f"  {model:<40} {stats['calls']:>5} calls  success {stats['success_rate']:.2f}  "
+                          f"p50 {stats['p50'] or 0:.1f}s  {stats['state']}")
+
+
+if __name__ == "__main__":
+    main()
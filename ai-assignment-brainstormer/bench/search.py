@@ -0,0 +1,112 @@
+# Benchmark: search_prompts latency on a large history
+#
+#   python bench/search.py                          # builds 1M rows in a temp dir
+#   python bench/search.py --db /tmp/search.db      # builds once, reuses after
+#   python bench/search.py --rows 200000
+#
+# Rows are synthetic: 80 words each (5 in the topic) drawn from a Zipf-like
+# vocabulary, so a term's frequency rank sets how many rows it matches. Each
+# query shape is timed best of --repeat, unfiltered and with a
+# generation_type filter, against TARGET_MS.
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import database  # noqa: E402
+
+TARGET_MS = 20.0
+VOCABULARY = 50_000
+WORDS_PER_ROW = 80
+TOPIC_WORDS = 5
+GENERATION_TYPES = ["outline", "code", "essay", "summary"]
+BATCH = 50_000
+START = datetime(2024, 1, 1)  # created_at of the first row, one row a minute after
+TERM_RANKS = [5, 50, 500, 5000, 40000]  # vocabulary rank of single-term queries
+
+
+def vocabulary(seed: int) -> list:
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice("abcdefghijklmnoprstuw") for _ in range(rnd.randint(3, 9)))
+            for _ in range(VOCABULARY)]
+
+
+def build(rows: int, words: list, seed: int):
+    """Fill an empty database through the app's schema."""
+    rnd = random.Random(seed)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    database.init_db()
+    start = time.perf_counter()
+    with database.get_connection() as conn:
+        for first in range(0, rows, BATCH):
+            batch = []
+            for number in range(first, min(rows, first + BATCH)):
+                row = rnd.choices(words, cum_weights=weights, k=WORDS_PER_ROW)
+                batch.append((" ".join(row[:TOPIC_WORDS]), rnd.choice(GENERATION_TYPES),
+                              database._encode_response(" ".join(row[TOPIC_WORDS:])), START + timedelta(minutes=number)))
+            conn.executemany(database.INSERT_PROMPT_SQL, batch)
+            conn.execute(
+                """INSERT INTO prompts_fts (rowid, topic, response)
+                   SELECT id, topic, response_text(response) FROM prompts WHERE id > ?""",
+                (first,)
+            )
+            conn.commit()
+            print(f"  {min(rows, first + BATCH):,} rows", end="\r", flush=True)
+        conn.execute("INSERT INTO prompts_fts (prompts_fts) VALUES ('optimize')")
+        conn.commit()
+    print(f"\nbuilt {rows:,} rows in {time.perf_counter() - start:.0f}s")
+
+
+def queries(words: list) -> list:
+    """(label, query) pairs, most to least common."""
+    shapes = [(f"1 term, rank {rank}", words[rank]) for rank in TERM_RANKS]
+    shapes += [
+        ("2 common terms", f"{words[5]} {words[50]}"),
+        ("common + rare", f"{words[5]} {words[40000]}"),
+        ("2 rare terms", f"{words[5000]} {words[40000]}"),
+    ]
+    return shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search_prompts latency on a large history")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", help="database to build (if missing) and reuse; default: a temp file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2)
+    args = parser.parse_args()
+
+    words = vocabulary(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        database.DB_PATH = Path(args.db or os.path.join(directory, "prompts.db"))
+        if not database.DB_PATH.exists():
+            build(args.rows, words, args.seed)
+        database.init_db()
+
+        print(f"{'query':<20} {'matches':>8}  {'type':<8} {'best ms':>8}  target {TARGET_MS:g} ms")
+        for label, query in queries(words):
+            with database.get_connection() as conn:
+                matches = conn.execute(
+                    "SELECT count(*) FROM prompts_fts WHERE prompts_fts MATCH ?", (database._fts_query(query),)
+                ).fetchone()[0]
+            for generation_type in (None, "code"):
+                database.search_prompts(query, 10, generation_type)  # warm the page cache
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    database.search_prompts(query, 10, generation_type)
+                    timings.append(time.perf_counter() - start)
+                best = min(timings) * 1000
+                print(f"{label:<20} {matches:>8,}  {generation_type or 'all':<8} {best:>8.1f}  "
+                      f"{'ok' if best <= TARGET_MS else 'MISS'}")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Local OpenAI-compatible stub for the API benchmarks: POST .../chat/completions
+# answers after a fixed delay, streamed (one chunk per token) or whole
+#
+#   python bench/stub_server.py --port 8911
+#   python bench/stub_server.py --port 8912 --tls         # self-signed cert
+#   python bench/stub_server.py --delay 0.05 --tokens 60  # a slow stream
+#   python bench/stub_server.py --fault a 0.6 0.3 1.5     # model a: ~0.6 s, 30% 503s after 1.5 s
+#
+# Benchmarks start it in-process with start_stub().
+import argparse
+import json
+import os
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _chunk(model: str, text: str) -> bytes:
+    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model,
+             "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+def _completion(model: str, text: str) -> bytes:
+    return json.dumps({
+        "id": "stub", "object": "chat.completion", "created": 0, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real provider
+    delay = 0.0  # seconds per token (a whole answer waits delay * tokens)
+    tokens = 20
+    # model -> (latency, failure probability, seconds before failing). Such a
+    # model answers after latency +-30%, or with a 503 after the failure delay.
+    faults = {}
+    rnd = random.Random(0)
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        model = body.get("model", "stub")
+        if model in self.faults:
+            latency, failure_probability, fail_after = self.faults[model]
+            if self.rnd.random() < failure_probability:
+                time.sleep(fail_after)
+                self._send(503, json.dumps({"error": {"message": "stub overloaded"}}).encode())
+                return
+            time.sleep(latency * self.rnd.uniform(0.7, 1.3))
+        if not body.get("stream"):
+            time.sleep(self.delay * self.tokens)
+            self._send(200, _completion(model, " ".join(f"tok{i}" for i in range(self.tokens))))
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            self._write_chunk(_chunk(model, f"tok{i} "))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # listen backlog: benchmarks open many connections at once
+
+    def handle_error(self, request, client_address):
+        # A client dropping a stream it no longer wants (a hedged call that
+        # lost, a cancelled job) is normal here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def self_signed_cert(directory: str) -> tuple:
+    """(cert, key) paths of a new localhost certificate; needs the openssl CLI."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_stub(port: int = 0, tls: tuple = None, delay: float = 0.0, tokens: int = 20, faults: dict = None,
+               seed: int = 0, handler=StubHandler):
+    """
+    Serve the stub from a daemon thread; returns (server, base_url).
+
+    tls is a (cert, key) pair; clients must trust cert (e.g. SSL_CERT_FILE).
+    faults is StubHandler.faults; seed fixes which requests fail.
+    """
+    handler = type(handler.__name__, (handler,), {
+        "delay": delay, "tokens": tokens, "faults": faults or {}, "rnd": random.Random(seed)
+    })
+    server = StubServer(("127.0.0.1", port), handler)
+    scheme = "http"
+    if tls:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://localhost:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--tls", action="store_true", help="serve https with a throwaway self-signed cert")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds per token")
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--fault", nargs=4, action="append", default=[],
+                        metavar=("MODEL", "LATENCY", "FAIL_P", "FAIL_AFTER"), help="inject latency and 503s")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        tls = self_signed_cert(directory) if args.tls else None
+        faults = {model: tuple(map(float, profile)) for model, *profile in args.fault}
+        server, base_url = start_stub(args.port, tls, args.delay, args.tokens, faults)
+        if tls:
+            print(f"cert: {tls[0]} (set SSL_CERT_FILE to it)")
+        print(f"serving {base_url}", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,811 @@
 # Database module for storing user prompts
+import atexit
+import os
+import queue
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+import unicodedata
+import zlib
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent / "prompts.db"
 
+# Connection pool settings. Streamlit reruns app.py on every interaction, so
+# connections are kept open and handed out to whichever script thread needs one.
+POOL_SIZE = 8
+BUSY_TIMEOUT = 5.0  # seconds to wait on a locked database
+CACHE_SIZE_KB = 8192  # page cache per connection
+STATEMENT_CACHE_SIZE = 64  # prepared statements kept per connection
 
-def init_db():
-    """Initialize the SQLite database with prompts table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS prompts (
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Response compression. Compressed responses are stored as BLOBs made of a
+# format-version byte followed by the compressed payload; plain TEXT rows
+# written before compression existed are still read as-is.
+COMPRESS_RESPONSES = os.getenv("COMPRESS_RESPONSES", "1") != "0"
+COMPRESS_MIN_BYTES = 512  # short responses don't shrink enough to bother
+ZLIB_LEVEL = 6
+RESPONSE_FORMAT_ZLIB = 1
+
+SEARCH_CANDIDATES = 2000  # newest full-text matches considered for ranking
+SNIPPET_WORDS = 12  # words shown around a search hit
+
+EXTRACTION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # on-disk extraction cache budget
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+JOBS_MAX_AGE = 7 * 24 * 3600  # seconds finished jobs are kept for reattaching
+
+# Write-behind queue. save_prompt_async hands rows to a background writer
+# that commits them in groups, so one fsync covers many sessions' inserts.
+WRITE_BATCH_SIZE = 64  # max rows per commit
+WRITE_BATCH_WINDOW = 0.05  # seconds to wait for more rows before committing
+
+_write_queue = queue.Queue()
+_STOP = object()  # queued by _shutdown_writer to end the writer loop
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a new tuned connection to the prompts database."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        check_same_thread=False,  # pooled connections move between threads
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    # WAL lets readers keep going while a writer commits; NORMAL sync is
+    # durable across application crashes in WAL mode and skips most fsyncs.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # Used by the full-text search triggers to index decompressed responses
+    conn.create_function("response_text", 1, _decode_response, deterministic=True)
+    return conn
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection, returning it to the pool afterwards."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def close_connections():
+    """Close every pooled connection (e.g. before swapping DB_PATH)."""
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have already run, so existing prompts.db files are upgraded in place.
+MIGRATIONS = [
+    [
+        """CREATE TABLE IF NOT EXISTS prompts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             topic TEXT NOT NULL,
             generation_type TEXT NOT NULL,
             response TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+        )""",
+    ],
+    [
+        # History listing (newest first), overall and per generation type
+        """CREATE INDEX IF NOT EXISTS idx_prompts_created
+           ON prompts (created_at DESC, id DESC, generation_type, topic)""",
+        """CREATE INDEX IF NOT EXISTS idx_prompts_type_created
+           ON prompts (generation_type, created_at DESC, id DESC, topic)""",
+    ],
+    [
+        # Full-text search over topics and (decompressed) responses
+        """CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(
+            topic, response, tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+        """INSERT INTO prompts_fts (rowid, topic, response)
+           SELECT id, topic, response_text(response) FROM prompts""",
+        """CREATE TRIGGER IF NOT EXISTS prompts_fts_insert AFTER INSERT ON prompts BEGIN
+               INSERT INTO prompts_fts (rowid, topic, response)
+               VALUES (new.id, new.topic, response_text(new.response));
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS prompts_fts_delete AFTER DELETE ON prompts BEGIN
+               DELETE FROM prompts_fts WHERE rowid = old.id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS prompts_fts_update AFTER UPDATE OF topic, response ON prompts BEGIN
+               UPDATE prompts_fts SET topic = new.topic, response = response_text(new.response)
+               WHERE rowid = new.id;
+           END""",
+    ],
+    [
+        # Extracted text of uploaded files, keyed by content hash
+        """CREATE TABLE IF NOT EXISTS extraction_cache (
+            key TEXT PRIMARY KEY,
+            file_type TEXT NOT NULL,
+            text BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used TIMESTAMP NOT NULL
+        )""",
+        """CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used
+           ON extraction_cache (last_used DESC, size)""",
+    ],
+    [
+        # Generated answers keyed by normalised topic + prompts + model (scope).
+        # signature is a MinHash of the topic; its LSH band buckets live in
+        # response_cache_bands so near-duplicate topics can be looked up.
+        """CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            scope TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            signature BLOB,
+            response BLOB NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL,
+            last_used TIMESTAMP NOT NULL
+        )""",
+        """CREATE INDEX IF NOT EXISTS idx_response_cache_last_used
+           ON response_cache (last_used DESC)""",
+        """CREATE INDEX IF NOT EXISTS idx_response_cache_created
+           ON response_cache (created_at)""",
+        """CREATE TABLE IF NOT EXISTS response_cache_bands (
+            scope TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (scope, band, bucket, key)
+        ) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS idx_response_cache_bands_key
+           ON response_cache_bands (key)""",
+        """CREATE TRIGGER IF NOT EXISTS response_cache_delete AFTER DELETE ON response_cache BEGIN
+               DELETE FROM response_cache_bands WHERE key = old.key;
+           END""",
+    ],
+    [
+        # Background generations and file analyses (jobs.py). The UI finds
+        # them again by id, so their results outlive reruns and page reloads.
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            label TEXT NOT NULL,
+            generation_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            note TEXT,
+            preview TEXT,
+            result BLOB,
+            error TEXT,
+            created_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP
+        )""",
+        """CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)""",
+        """CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)""",
+    ],
+    [
+        # Rebuild the search index as a contentless table: the default one
+        # kept a second, uncompressed copy of every response. Rows are now
+        # indexed by _insert_prompt instead of triggers, so connections
+        # without response_text() can write to prompts; rows they insert are
+        # searchable after `python database.py reindex`. Deleted prompts
+        # leave index entries behind that searches skip via the join (and
+        # reindex drops). Run `python database.py compress` afterwards to
+        # VACUUM the freed pages back to the filesystem.
+        "DROP TRIGGER IF EXISTS prompts_fts_insert",
+        "DROP TRIGGER IF EXISTS prompts_fts_delete",
+        "DROP TRIGGER IF EXISTS prompts_fts_update",
+        "DROP TABLE IF EXISTS prompts_fts",
+        """CREATE VIRTUAL TABLE prompts_fts USING fts5(
+            topic, response, content = '', tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+        """INSERT INTO prompts_fts (rowid, topic, response)
+           SELECT id, topic, response_text(response) FROM prompts""",
+    ],
+    [
+        # History row a finished job was saved as (NULL: not saved; a
+        # done job's error then says why)
+        "ALTER TABLE jobs ADD COLUMN history_id INTEGER",
+    ],
+    [
+        # Process running the job (host:pid:token), so recovery only fails
+        # the jobs of processes that are gone
+        "ALTER TABLE jobs ADD COLUMN owner TEXT",
+    ],
+    [
+        # Search joins every full-text match to prompts to skip deleted rows
+        # and filter by type; this narrow index answers that from a few MB
+        # instead of reading each row's page of the (large) table
+        """CREATE INDEX IF NOT EXISTS idx_prompts_id_type
+           ON prompts (id, generation_type)""",
+    ],
+]
+
+
+def _encode_response(response: str):
+    """Encode a response for storage, compressing it when worthwhile."""
+    if response is None or not COMPRESS_RESPONSES:
+        return response
+
+    raw = response.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return response
+    return bytes([RESPONSE_FORMAT_ZLIB]) + zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decode_response(value) -> str:
+    """Decode a stored response, whether plain TEXT or a compressed BLOB."""
+    if not isinstance(value, bytes):
+        return value
+
+    if value[0] == RESPONSE_FORMAT_ZLIB:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    raise ValueError(f"Unknown response storage format: {value[0]}")
+
+
+def init_db():
+    """Initialize the SQLite database and apply pending schema migrations."""
+    with get_connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        # Re-check under the write lock in case another session migrated first
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statements in MIGRATIONS[version:]:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version={len(MIGRATIONS)}")
+        conn.commit()
+
+
+INSERT_PROMPT_SQL = "INSERT INTO prompts (topic, generation_type, response, created_at) VALUES (?, ?, ?, ?)"
+INSERT_FTS_SQL = "INSERT INTO prompts_fts (rowid, topic, response) VALUES (?, ?, ?)"
+
+
+def _insert_prompt(conn: sqlite3.Connection, row: tuple) -> int:
+    """Insert an (encoded) prompt row and add it to the search index."""
+    prompt_id = conn.execute(INSERT_PROMPT_SQL, row).lastrowid
+    conn.execute(INSERT_FTS_SQL, (prompt_id, row[0], _decode_response(row[2])))
+    return prompt_id
 
 
 def save_prompt(topic: str, generation_type: str, response: str = None) -> int:
     """Save a user prompt to the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO prompts (topic, generation_type, response, created_at) VALUES (?, ?, ?, ?)",
-        (topic, generation_type, response, datetime.now())
-    )
-    prompt_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return prompt_id
+    with get_connection() as conn:
+        prompt_id = _insert_prompt(
+            conn,
+            (topic, generation_type, _encode_response(response), datetime.now())
+        )
+        conn.commit()
+        return prompt_id
 
 
-def get_prompt_history(limit: int = 10) -> list:
-    """Retrieve recent prompt history."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT id, topic, generation_type, response, created_at 
-           FROM prompts ORDER BY created_at DESC LIMIT ?""",
-        (limit,)
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    
+def save_prompt_async(topic: str, generation_type: str, response: str = None) -> Future:
+    """
+    Queue a prompt for saving without waiting on disk I/O.
+
+    Returns a Future that resolves to the new row id once the batch holding
+    it has been committed.
+    """
+    _ensure_writer()
+    future = Future()
+    # Timestamp and compress now, so rows keep submission order and the
+    # writer thread only does I/O
+    row = (topic, generation_type, _encode_response(response), datetime.now())
+    _write_queue.put((row, future))
+    return future
+
+
+def flush_writes(timeout: float = None):
+    """Block until every row queued so far has been committed."""
+    if _writer_thread is None:
+        return
+    marker = Future()
+    _write_queue.put((None, marker))
+    marker.result(timeout)
+
+
+def _ensure_writer():
+    """Start the background writer thread on first use."""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="prompt-writer", daemon=True)
+            _writer_thread.start()
+
+
+def _writer_loop():
+    """Collect queued rows and commit them in batches until told to stop."""
+    while True:
+        item = _write_queue.get()
+        if item is _STOP:
+            return
+
+        batch = [item]
+        stop = False
+        deadline = time.monotonic() + WRITE_BATCH_WINDOW
+        # Group commit: keep collecting until the batch is full or the window closes
+        while len(batch) < WRITE_BATCH_SIZE and batch[-1][0] is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _write_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+
+        _commit_batch(batch)
+        if stop:
+            return
+
+
+def _commit_batch(batch: list):
+    """Insert a batch of queued rows in one transaction and resolve their futures."""
+    rows = [(row, future) for row, future in batch if row is not None]
+    if rows:
+        try:
+            with get_connection() as conn:
+                ids = [_insert_prompt(conn, row) for row, _ in rows]
+                conn.commit()
+        except Exception as e:
+            print(f"Failed to save {len(rows)} prompts: {e}")
+            for _, future in rows:
+                future.set_exception(e)
+        else:
+            for (_, future), prompt_id in zip(rows, ids):
+                future.set_result(prompt_id)
+
+    # Flush markers resolve once everything queued before them is committed
+    for row, future in batch:
+        if row is None:
+            future.set_result(None)
+
+
+@atexit.register
+def _shutdown_writer():
+    """Commit whatever is still queued when the process exits."""
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _write_queue.put(_STOP)
+        _writer_thread.join(timeout=10)
+
+
+def get_prompt_history(limit: int = 10, before_id: int = None, generation_type: str = None) -> list:
+    """
+    Retrieve recent prompt history, newest first.
+
+    Only id/topic/type/timestamp are returned (served straight from the
+    history indexes); use get_prompt() to load a response body.
+
+    Pages are keyset-paginated: pass the id of the last item of the previous
+    page as ``before_id`` to get the next one. Each page is a single index
+    seek, so it costs the same however large the table grows.
+    """
+    conditions = []
+    params = []
+    if generation_type:
+        conditions.append("generation_type = ?")
+        params.append(generation_type)
+    if before_id is not None:
+        conditions.append("(created_at, id) < (SELECT created_at, id FROM prompts WHERE id = ?)")
+        params.append(before_id)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""SELECT id, topic, generation_type, created_at
+                FROM prompts {where}
+                ORDER BY created_at DESC, id DESC LIMIT ?""",
+            (*params, limit)
+        ).fetchall()
+
     return [
         {
             "id": row[0],
             "topic": row[1],
             "generation_type": row[2],
-            "response": row[3],
-            "created_at": row[4]
+            "created_at": row[3]
         }
         for row in rows
     ]
+
+
+def get_prompt(prompt_id: int) -> dict:
+    """Retrieve a single saved prompt including its response, or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT id, topic, generation_type, response, created_at FROM prompts WHERE id = ?",
+            (prompt_id,)
+        ).fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        "id": row[0],
+        "topic": row[1],
+        "generation_type": row[2],
+        "response": _decode_response(row[3]),
+        "created_at": row[4]
+    }
+
+
+def _fts_query(text: str) -> str:
+    """Turn free-form user input into a safe FTS5 query matching all of its words."""
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", text))
+
+
+def _fold(word: str) -> str:
+    """Case- and accent-fold a word the way the unicode61 tokenizer does."""
+    if word.isascii():
+        return word.lower()
+    word = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(ch for ch in word if not unicodedata.combining(ch))
+
+
+def _snippet(text: str, terms: set, size: int = SNIPPET_WORDS) -> str:
+    """
+    About size words of text around its densest run of matching terms, with
+    the matches in **bold**; "" if no term occurs. Stands in for FTS5's
+    snippet(), which has no text to work from in a contentless index.
+    """
+    text = text or ""
+    more_before = more_after = False
+    # Most hits are spelled as typed: only tokenize the text around the first
+    # one. Accented spellings of a term fall through to a full scan.
+    fast = re.search("|".join(rf"\b{re.escape(term)}\b" for term in terms), text, re.IGNORECASE)
+    if fast:
+        lo, hi = max(0, fast.start() - 200), fast.end() + 800
+        more_before, more_after = lo > 0, hi < len(text)
+        text = text[lo:hi]
+
+    words = list(re.finditer(r"\w+", text))
+    hits = [i for i, word in enumerate(words) if _fold(word.group()) in terms]
+    if not hits:
+        return ""
+
+    first = max(hits, key=lambda hit: sum(hit <= other < hit + size for other in hits))
+    start = max(0, min(first - 2, len(words) - size))
+    end = min(len(words), start + size)
+    parts = []
+    for i in range(start, end):
+        word = words[i].group()
+        parts.append(f"**{word}**" if i in hits else word)
+    return (("…" if start > 0 or more_before else "") + " ".join(parts)
+            + ("…" if end < len(words) or more_after else ""))
+
+
+def search_prompts(query: str, limit: int = 10, generation_type: str = None) -> list:
+    """
+    Full-text search over saved prompts and responses.
+
+    Returns BM25-ranked hits (best first) with a highlighted snippet; topic
+    matches weigh more than matches in the response body. Only the newest
+    SEARCH_CANDIDATES matches are ranked, so very common words stay cheap.
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+
+    type_filter = "AND p.generation_type = ?" if generation_type else ""
+    params = (match, generation_type) if generation_type else (match,)
+    with get_connection() as conn:
+        ranked = conn.execute(
+            f"""SELECT id, rank FROM (
+                    SELECT prompts_fts.rowid AS id, bm25(prompts_fts, 5.0, 1.0) AS rank
+                    FROM prompts_fts
+                    JOIN prompts p INDEXED BY idx_prompts_id_type ON p.id = prompts_fts.rowid
+                    WHERE prompts_fts MATCH ? {type_filter}
+                    ORDER BY prompts_fts.rowid DESC LIMIT ?
+                )
+                ORDER BY rank LIMIT ?""",
+            (*params, SEARCH_CANDIDATES, limit)
+        ).fetchall()
+        if not ranked:
+            return []
+
+        # Snippets are only built for the page actually returned
+        placeholders = ", ".join("?" * len(ranked))
+        rows = conn.execute(
+            f"""SELECT id, topic, generation_type, created_at, response
+                FROM prompts WHERE id IN ({placeholders})""",
+            [prompt_id for prompt_id, _ in ranked]
+        ).fetchall()
+
+    terms = {_fold(term) for term in re.findall(r"\w+", query)}
+    by_id = {row[0]: row for row in rows}
+    return [
+        {
+            "id": prompt_id,
+            "topic": by_id[prompt_id][1],
+            "generation_type": by_id[prompt_id][2],
+            "created_at": by_id[prompt_id][3],
+            "snippet": (_snippet(_decode_response(by_id[prompt_id][4]), terms)
+                        or _snippet(by_id[prompt_id][1], terms)),
+            "rank": rank
+        }
+        for prompt_id, rank in ranked
+    ]
+
+
+def rebuild_search_index() -> int:
+    """Re-index every prompt (e.g. rows written by other tools); returns the row count."""
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO prompts_fts (prompts_fts) VALUES ('delete-all')")
+        count = conn.execute(
+            """INSERT INTO prompts_fts (rowid, topic, response)
+               SELECT id, topic, response_text(response) FROM prompts"""
+        ).rowcount
+        conn.commit()
+    return count
+
+
+def get_cached_extraction(key: str) -> tuple:
+    """Look up cached extracted text; returns (text, file_type) or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT text, file_type FROM extraction_cache WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        conn.execute(
+            "UPDATE extraction_cache SET last_used = ? WHERE key = ?",
+            (datetime.now(), key)
+        )
+        conn.commit()
+
+    return _decode_response(row[0]), row[1]
+
+
+def save_cached_extraction(key: str, text: str, file_type: str):
+    """Cache extracted text, evicting least recently used entries over budget."""
+    stored = _encode_response(text)
+    size = len(stored)
+    with get_connection() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO extraction_cache (key, file_type, text, size, last_used)
+               VALUES (?, ?, ?, ?, ?)""",
+            (key, file_type, stored, size, datetime.now())
+        )
+        # Keep the most recently used entries whose sizes fit in the budget
+        conn.execute(
+            """DELETE FROM extraction_cache WHERE key IN (
+                   SELECT key FROM (
+                       SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running
+                       FROM extraction_cache
+                   ) WHERE running > ?
+               )""",
+            (EXTRACTION_CACHE_MAX_BYTES,)
+        )
+        conn.commit()
+
+
+def get_cached_response(key: str, max_age: float) -> str:
+    """Look up a cached answer no older than max_age seconds; returns None on a miss."""
+    now = datetime.now()
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT response FROM response_cache WHERE key = ? AND created_at > ?",
+            (key, now - timedelta(seconds=max_age))
+        ).fetchone()
+        if row is None:
+            return None
+
+        conn.execute(
+            "UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE key = ?",
+            (now, key)
+        )
+        conn.commit()
+
+    return _decode_response(row[0])
+
+
+def get_response_cache_candidates(scope: str, buckets: list, max_age: float, limit: int = 20) -> list:
+    """
+    Cached entries in scope sharing LSH (band, bucket) pairs with a query,
+    most shared bands first; returns (key, signature) tuples.
+    """
+    if not buckets:
+        return []
+    placeholders = ", ".join("(?, ?)" for _ in buckets)
+    params = [value for pair in buckets for value in pair]
+    with get_connection() as conn:
+        return conn.execute(
+            # Joining against the query's buckets makes each one a primary-key
+            # lookup; a row-value IN would scan the whole scope
+            f"""WITH query (band, bucket) AS (VALUES {placeholders})
+                SELECT c.key, c.signature
+                FROM (
+                    SELECT b.key, COUNT(*) AS shared
+                    FROM query AS q CROSS JOIN response_cache_bands AS b
+                    WHERE b.scope = ? AND b.band = q.band AND b.bucket = q.bucket
+                    GROUP BY b.key ORDER BY shared DESC LIMIT ?
+                ) AS m
+                JOIN response_cache AS c ON c.key = m.key
+                WHERE c.created_at > ?
+                ORDER BY m.shared DESC""",
+            params + [scope, limit, datetime.now() - timedelta(seconds=max_age)]
+        ).fetchall()
+
+
+def save_cached_response(key: str, scope: str, topic: str, response: str,
+                         signature: bytes = None, buckets: list = (), max_age: float = None):
+    """Cache an answer, dropping expired and least recently used entries."""
+    now = datetime.now()
+    with get_connection() as conn:
+        # REPLACE doesn't fire the delete trigger, so clear old buckets first
+        conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+        conn.execute(
+            """INSERT INTO response_cache (key, scope, topic, signature, response, created_at, last_used)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (key, scope, topic, signature, _encode_response(response), now, now)
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO response_cache_bands (scope, band, bucket, key) VALUES (?, ?, ?, ?)",
+            [(scope, band, bucket, key) for band, bucket in buckets]
+        )
+        if max_age is not None:
+            conn.execute("DELETE FROM response_cache WHERE created_at <= ?", (now - timedelta(seconds=max_age),))
+        conn.execute(
+            """DELETE FROM response_cache WHERE key IN (
+                   SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+               )""",
+            (RESPONSE_CACHE_MAX_ENTRIES,)
+        )
+        conn.commit()
+
+
+def create_job(job_id: str, kind: str, label: str, generation_type: str, owner: str = None):
+    """Record a newly submitted job as queued."""
+    with get_connection() as conn:
+        conn.execute(
+            """INSERT INTO jobs (id, kind, label, generation_type, status, owner, created_at)
+               VALUES (?, ?, ?, ?, 'queued', ?, ?)""",
+            (job_id, kind, label, generation_type, owner, datetime.now())
+        )
+        conn.commit()
+
+
+def set_job_status(job_id: str, status: str):
+    """Update the status of a job that is still in progress."""
+    with get_connection() as conn:
+        conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+        conn.commit()
+
+
+def finish_job(job_id: str, status: str, result: str = None, note: str = None,
+               preview: str = None, error: str = None, history_id: int = None):
+    """Store the outcome of a job and drop finished jobs past JOBS_MAX_AGE."""
+    now = datetime.now()
+    with get_connection() as conn:
+        conn.execute(
+            """UPDATE jobs SET status = ?, result = ?, note = ?, preview = ?, error = ?,
+                   history_id = ?, finished_at = ?
+               WHERE id = ?""",
+            (status, _encode_response(result), note, preview, error, history_id, now, job_id)
+        )
+        conn.execute("DELETE FROM jobs WHERE finished_at <= ?", (now - timedelta(seconds=JOBS_MAX_AGE),))
+        conn.commit()
+
+
+def get_job_record(job_id: str) -> dict:
+    """Load a job by id; returns None if it doesn't exist (or was pruned)."""
+    with get_connection() as conn:
+        row = conn.execute(
+            """SELECT id, kind, label, generation_type, status, note, preview, result, error,
+                      history_id, created_at
+               FROM jobs WHERE id = ?""",
+            (job_id,)
+        ).fetchone()
+
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "kind": row[1],
+        "label": row[2],
+        "generation_type": row[3],
+        "status": row[4],
+        "note": row[5],
+        "preview": row[6],
+        "result": _decode_response(row[7]),
+        "error": row[8],
+        "history_id": row[9],
+        "created_at": row[10]
+    }
+
+
+def get_unfinished_job_owners() -> list:
+    """Owners of queued/running jobs (None for jobs recorded without one)."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def fail_unfinished_jobs(error: str, owners: list) -> int:
+    """Mark the queued/running jobs of the given owners as failed (their threads died with them)."""
+    named = [owner for owner in owners if owner is not None]
+    placeholders = ", ".join("?" * len(named))
+    with get_connection() as conn:
+        cursor = conn.execute(
+            f"""UPDATE jobs SET status = 'failed', error = ?, finished_at = ?
+                WHERE status IN ('queued', 'running')
+                  AND (owner IN ({placeholders}) OR (owner IS NULL AND ?))""",
+            (error, datetime.now(), *named, None in owners)
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+def compress_existing_responses(batch_size: int = 500) -> int:
+    """
+    One-shot migration: compress responses still stored as plain TEXT.
+
+    Runs in batches so the write lock is released between them. Returns the
+    number of rows converted.
+    """
+    converted = 0
+    last_id = 0
+    with get_connection() as conn:
+        while True:
+            rows = conn.execute(
+                """SELECT id, response FROM prompts
+                   WHERE id > ? AND typeof(response) = 'text'
+                   ORDER BY id LIMIT ?""",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row_id, response in rows:
+                encoded = _encode_response(response)
+                if isinstance(encoded, bytes):
+                    updates.append((encoded, row_id))
+            conn.executemany("UPDATE prompts SET response = ? WHERE id = ?", updates)
+            conn.commit()
+            converted += len(updates)
+            last_id = rows[-1][0]
+
+        # Hand the freed pages back to the filesystem
+        conn.execute("VACUUM")
+
+    return converted
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["compress"]:
+        init_db()
+        print(f"Compressed {compress_existing_responses()} responses.")
+    elif sys.argv[1:] == ["reindex"]:
+        init_db()
+        print(f"Indexed {rebuild_search_index()} prompts.")
+    else:
+        print("Usage: python database.py compress|reindex")
@@ -1,79 +1,535 @@
 # File processing utilities for extracting text from various file types
+import hashlib
 import io
-from PIL import Image
-import pytesseract
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from PIL import Image, ImageOps, ImageSequence
 from PyPDF2 import PdfReader
 from pptx import Presentation
+from database import get_cached_extraction, save_cached_extraction
+from ocr_engine import get_ocr_engine
+
+# Bump whenever extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = 4
+
+# Scanned PDF pages have no text layer; their embedded images are OCR'd instead
+PDF_OCR_FALLBACK = os.getenv("PDF_OCR_FALLBACK", "1") != "0"
+PDF_OCR_MIN_CHARS = 20  # pages with less extractable text than this count as scanned
+PDF_OCR_MIN_IMAGE_SIDE = 100  # skip logos/bullets smaller than this (pixels)
+
+# OCR preprocessing. Phone photos are 12+ MP; tesseract needs ~300 DPI, which
+# for a photographed A4 page (11.7in long edge) is about 3500px.
+OCR_TARGET_DPI = 300
+OCR_PAGE_LONG_EDGE_INCHES = 11.7
+OCR_DESKEW = os.getenv("OCR_DESKEW", "0") == "1"
+OCR_DESKEW_MAX_ANGLE = 5.0  # degrees searched either way
+OCR_DESKEW_STEP = 0.5
+
+# In-memory tier of the extraction cache (the on-disk tier lives in prompts.db)
+MEMORY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+_memory_cache = OrderedDict()  # key -> (text, file_type), least recently used first
+_memory_cache_bytes = 0
+_memory_cache_lock = threading.Lock()
+
+
+def fix_orientation(image: Image.Image) -> Image.Image:
+    """Rotate phone photos upright according to their EXIF orientation tag."""
+    return ImageOps.exif_transpose(image)
+
+
+def downscale_to_dpi(image: Image.Image, target_dpi: int = OCR_TARGET_DPI) -> Image.Image:
+    """Shrink images larger than a page scanned at target_dpi would be (EXIF is kept)."""
+    max_edge = int(target_dpi * OCR_PAGE_LONG_EDGE_INCHES)
+    scale = max_edge / max(image.size)
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # draft() lets JPEG decode at reduced size instead of decoding all 12 MP
+    image.draft(image.mode, size)
+    return image.resize(size, Image.LANCZOS)
+
+
+def to_grayscale(image: Image.Image) -> Image.Image:
+    return image.convert("L")
+
+
+def binarize(image: Image.Image) -> Image.Image:
+    """Black-and-white threshold chosen with Otsu's method."""
+    image = image.convert("L")
+    histogram = image.histogram()
+    total = sum(histogram)
+    weighted_total = sum(value * count for value, count in enumerate(histogram))
+
+    best_threshold, best_variance = 127, -1.0
+    background = weighted_background = 0
+    for threshold, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += threshold * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+
+    return image.point(lambda value: 255 if value > best_threshold else 0)
+
+
+def deskew(image: Image.Image) -> Image.Image:
+    """
+    Straighten slightly rotated pages.
+
+    Text lines are sharpest when horizontal, so the angle whose row
+    brightness profile varies the most wins. Angles are tried on a small
+    thumbnail; only the final rotation touches the full image.
+    """
+    gray = image.convert("L")
+    thumbnail = gray.copy()
+    thumbnail.thumbnail((800, 800))
+
+    def score(angle: float) -> float:
+        rotated = thumbnail.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+        profile = rotated.resize((1, rotated.height), Image.BOX).tobytes()
+        mean = sum(profile) / len(profile)
+        return sum((value - mean) ** 2 for value in profile)
+
+    steps = int(OCR_DESKEW_MAX_ANGLE / OCR_DESKEW_STEP)
+    best_angle = max((i * OCR_DESKEW_STEP for i in range(-steps, steps + 1)), key=score)
+    if best_angle == 0:
+        return image
+    return gray.rotate(best_angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+
+# Steps applied, in order, to every image before OCR
+OCR_PREPROCESS_STEPS = [downscale_to_dpi, fix_orientation, to_grayscale]
+if OCR_DESKEW:
+    OCR_PREPROCESS_STEPS.append(deskew)
+OCR_PREPROCESS_STEPS.append(binarize)
+
+
+def preprocess_image(image: Image.Image, steps: list = None) -> Image.Image:
+    """Run an image through the OCR preprocessing pipeline (OCR_PREPROCESS_STEPS by default)."""
+    for step in OCR_PREPROCESS_STEPS if steps is None else steps:
+        image = step(image)
+    return image
+
+
+def _page_images(page) -> list:
+    """Decode the images embedded in a PDF page that are large enough to OCR."""
+    images = []
+    for embedded in page.images:
+        try:
+            image = Image.open(io.BytesIO(embedded.data))
+        except Exception:
+            continue
+        if min(image.size) >= PDF_OCR_MIN_IMAGE_SIDE:
+            images.append(preprocess_image(image))
+    return images
+
+
+def _ocr_ready(ocr_jobs: list) -> bool:
+    return all(future.done() for futures in ocr_jobs for future in futures)
+
+
+def _finish_page(entry: dict, ocr_jobs: list) -> dict:
+    """Fold a page's OCR results (if any) into its entry."""
+    if ocr_jobs:
+        results = [get_ocr_engine().collect_page(futures) for futures in ocr_jobs]
+        ocr_text = "\n".join(text for text, _ in results if text)
+        entry["seconds"] += sum(seconds for _, seconds in results)
+        if len(ocr_text.strip()) > len(entry["text"].strip()):
+            entry["text"] = ocr_text
+    return entry
+
+
+def iter_pdf_pages(file, ocr_fallback: bool = PDF_OCR_FALLBACK):
+    """
+    Extract text page by page, OCR-ing pages that have no text layer.
+
+    Pages with a text layer keep the fast path. Text-less pages are handed to
+    the OCR worker pool as soon as they are found while reading carries on;
+    pages are still yielded in order, each as soon as it is ready.
+
+    Yields:
+        dict: "page", "total", "text", "method" ("text" or "ocr") and
+        "seconds" spent on that page
+    """
+    reader = PdfReader(file)
+    total = len(reader.pages)
+    pending = deque()  # (page entry, OCR tile futures per image), in page order
+
+    for number, page in enumerate(reader.pages, 1):
+        start = time.perf_counter()
+        text = page.extract_text() or ""
+        entry = {"page": number, "total": total, "text": text, "method": "text"}
+        ocr_jobs = []
+        if ocr_fallback and len(text.strip()) < PDF_OCR_MIN_CHARS:
+            ocr_jobs = [get_ocr_engine().submit_page(image) for image in _page_images(page)]
+            if ocr_jobs:
+                entry["method"] = "ocr"
+        entry["seconds"] = time.perf_counter() - start
+        pending.append((entry, ocr_jobs))
+
+        while pending and _ocr_ready(pending[0][1]):
+            yield _finish_page(*pending.popleft())
+
+    while pending:
+        yield _finish_page(*pending.popleft())
+
+
+def _log_pdf_timings(pages: list):
+    """Print where extraction time went, split by text-layer vs OCR pages."""
+    if not pages:
+        return
+    for method in ("text", "ocr"):
+        subset = [p for p in pages if p["method"] == method]
+        if subset:
+            print(f"PDF {method} pages: {len(subset)} in {sum(p['seconds'] for p in subset):.2f}s")
+    slowest = sorted(pages, key=lambda p: p["seconds"], reverse=True)[:3]
+    print("Slowest PDF pages: " + ", ".join(
+        f"p{p['page']} ({p['method']}) {p['seconds']:.2f}s" for p in slowest
+    ))
 
 
 def extract_text_from_pdf(file) -> str:
-    """Extract text from a PDF file."""
+    """Extract text from a PDF file, with OCR for scanned pages."""
     try:
-        reader = PdfReader(file)
-        text_parts = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
+        pages = list(iter_pdf_pages(file))
+        _log_pdf_timings(pages)
+        text_parts = [p["text"] for p in pages if p["text"].strip()]
         return "\n\n".join(text_parts) if text_parts else "No text found in PDF."
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
 
+def iter_pptx_slides(file):
+    """
+    Extract text slide by slide from a PowerPoint file.
+
+    Yields:
+        dict: "page" (slide number), "total" and "text" ("" for slides without text)
+    """
+    prs = Presentation(file)
+    total = len(prs.slides)
+
+    for slide_num, slide in enumerate(prs.slides, 1):
+        slide_text = [f"--- Slide {slide_num} ---"]
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text.strip():
+                slide_text.append(shape.text)
+        text = "\n".join(slide_text) if len(slide_text) > 1 else ""
+        yield {"page": slide_num, "total": total, "text": text}
+
+
 def extract_text_from_pptx(file) -> str:
     """Extract text from a PowerPoint file."""
     try:
-        prs = Presentation(file)
-        text_parts = []
-        
-        for slide_num, slide in enumerate(prs.slides, 1):
-            slide_text = [f"--- Slide {slide_num} ---"]
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    slide_text.append(shape.text)
-            if len(slide_text) > 1:
-                text_parts.append("\n".join(slide_text))
-        
+        text_parts = [slide["text"] for slide in iter_pptx_slides(file) if slide["text"]]
         return "\n\n".join(text_parts) if text_parts else "No text found in PowerPoint."
     except Exception as e:
         return f"Error reading PowerPoint: {str(e)}"
 
 
+def iter_image_pages(file):
+    """
+    OCR an image page by page (multi-frame TIFF/GIF scans have several pages).
+
+    Every page is queued on the OCR worker pool up front, then yielded in order.
+
+    Yields:
+        dict: "page", "total" and "text"
+    """
+    image = Image.open(file)
+    if getattr(image, "n_frames", 1) > 1:
+        frames = [frame.copy() for frame in ImageSequence.Iterator(image)]
+    else:
+        frames = [image]
+
+    engine = get_ocr_engine()
+    submitted = [engine.submit_page(preprocess_image(frame)) for frame in frames]
+    for number, futures in enumerate(submitted, 1):
+        text, _ = engine.collect_page(futures)
+        yield {"page": number, "total": len(frames), "text": text}
+
+
 def extract_text_from_image(file) -> str:
     """Extract text from an image using OCR (supports handwritten text too)."""
     try:
-        image = Image.open(file)
-        # Use pytesseract for OCR
-        text = pytesseract.image_to_string(image, lang='eng+ind')  # English + Indonesian
+        text = "\n\n".join(page["text"] for page in iter_image_pages(file))
         return text.strip() if text.strip() else "No text detected in image."
     except Exception as e:
         return f"Error reading image: {str(e)}"
 
 
-def process_uploaded_file(uploaded_file) -> tuple[str, str]:
+def _cache_key(data: bytes, kind: str) -> str:
+    """Build the extraction cache key from the file bytes and extractor version."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"v{EXTRACTOR_VERSION}:{kind}:{digest}"
+
+
+def _memory_cache_get(key: str):
+    with _memory_cache_lock:
+        entry = _memory_cache.get(key)
+        if entry is not None:
+            _memory_cache.move_to_end(key)
+        return entry
+
+
+def _memory_cache_put(key: str, text: str, file_type: str):
+    global _memory_cache_bytes
+    size = len(text)
+    if size > MEMORY_CACHE_MAX_BYTES:
+        return
+
+    with _memory_cache_lock:
+        if key in _memory_cache:
+            _memory_cache_bytes -= len(_memory_cache.pop(key)[0])
+        _memory_cache[key] = (text, file_type)
+        _memory_cache_bytes += size
+        while _memory_cache_bytes > MEMORY_CACHE_MAX_BYTES:
+            _, (evicted, _) = _memory_cache.popitem(last=False)
+            _memory_cache_bytes -= len(evicted)
+
+
+# Per file type: page iterator, file-type label used in error messages, and
+# the message shown when nothing could be extracted
+_EXTRACTORS = {
+    "PDF": (iter_pdf_pages, "PDF", "No text found in PDF."),
+    "PowerPoint": (iter_pptx_slides, "PowerPoint", "No text found in PowerPoint."),
+    "Image": (iter_image_pages, "image", "No text detected in image."),
+}
+
+
+def get_file_type(file_name: str) -> str:
+    """Classify an upload by its extension: PDF, PowerPoint, Image or Unknown."""
+    file_name = file_name.lower()
+    if file_name.endswith('.pdf'):
+        return "PDF"
+    if file_name.endswith(('.pptx', '.ppt')):
+        return "PowerPoint"
+    if file_name.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
+        return "Image"
+    return "Unknown"
+
+
+class _Extraction:
+    """
+    One extraction of a file, run by a background thread into a buffer of
+    segments that every reader replays. It is shared by the upload's
+    speculative start (owners, one per session) and by whoever consumes the
+    text (readers), and stopped once both have gone.
+    """
+
+    def __init__(self, key: str, data: bytes, file_type: str):
+        self.key = key
+        self.file_type = file_type
+        self.segments = []
+        self.progress = None  # (done, total) pages
+        self.done = False
+        self.error = None
+        self.owners = set()
+        self.readers = 0
+        self.cancelled = False
+        self._data = data
+        self._cond = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=self._run, name="extraction", daemon=True).start()
+
+    def cancel(self):
+        """Stop after the page being extracted; the partial text is not cached."""
+        with self._cond:
+            if not self.done:
+                self.cancelled = True
+
+    def _run(self):
+        iter_pages = _EXTRACTORS[self.file_type][0]
+        pages = []
+        try:
+            # Extractors read from the start; previews may have moved the cursor
+            for page in iter_pages(io.BytesIO(self._data)):
+                pages.append(page)
+                with self._cond:
+                    if self.cancelled:
+                        break
+                    self.progress = (page["page"], page["total"])
+                    if page["text"].strip():
+                        self.segments.append(page["text"])
+                    self._cond.notify_all()
+            else:
+                if self.file_type == "PDF":
+                    _log_pdf_timings(pages)
+                if self.segments:
+                    text = "\n\n".join(self.segments)
+                    _memory_cache_put(self.key, text, self.file_type)
+                    save_cached_extraction(self.key, text, self.file_type)
+        except Exception as e:
+            self.error = e
+        finally:
+            with _extractions_lock:
+                if _extractions.get(self.key) is self:
+                    del _extractions[self.key]
+            with self._cond:
+                self.done = True
+                self._data = None
+                self._cond.notify_all()
+
+    def read(self, on_progress=None):
+        """Yield every segment from the start, reporting page progress on the way."""
+        position = 0
+        reported = None
+        while True:
+            with self._cond:
+                while position == len(self.segments) and self.progress == reported and not self.done:
+                    self._cond.wait()
+                segments = self.segments[position:]
+                position += len(segments)
+                progress = self.progress
+                finished = self.done and position == len(self.segments)
+            if on_progress and progress != reported:
+                on_progress(*progress)
+                reported = progress
+            yield from segments
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+_extractions = {}  # cache key -> _Extraction still running
+_extractions_lock = threading.Lock()
+
+
+def _join_extraction(key: str, data: bytes, file_type: str, owner: str = None) -> _Extraction:
+    # Joins the running extraction of these bytes, or starts one
+    with _extractions_lock:
+        extraction = _extractions.get(key)
+        if extraction is None:
+            extraction = _extractions[key] = _Extraction(key, data, file_type)
+            extraction.start()
+        if owner is None:
+            extraction.readers += 1
+        else:
+            extraction.owners.add(owner)
+        return extraction
+
+
+def _leave_extraction(extraction: _Extraction, owner: str = None):
+    # Stops the extraction once nobody is waiting for it any more
+    with _extractions_lock:
+        if owner is None:
+            extraction.readers -= 1
+        else:
+            extraction.owners.discard(owner)
+        if extraction.readers or extraction.owners:
+            return
+        if _extractions.get(extraction.key) is extraction:
+            del _extractions[extraction.key]
+    extraction.cancel()
+
+
+def _upload_key(uploaded_file) -> tuple:
+    file_type = get_file_type(uploaded_file.name)
+    if file_type == "Unknown":
+        raise ValueError("Unsupported file type. Please upload PDF, PPTX, or image files.")
+    data = uploaded_file.getvalue()
+    return _cache_key(data, uploaded_file.name.lower().rsplit(".", 1)[-1]), data, file_type
+
+
+def _cached_extraction(key: str):
+    cached = _memory_cache_get(key)
+    if cached is None:
+        cached = get_cached_extraction(key)
+        if cached is not None:
+            _memory_cache_put(key, *cached)
+    return cached
+
+
+def iter_uploaded_file(uploaded_file, on_progress=None):
+    """
+    Extract an uploaded file incrementally, yielding text one page/slide at a time.
+
+    on_progress(done, total) is called after every page. A cached file is
+    yielded as a single segment; a complete extraction is cached once it
+    finishes. If the file is already being extracted (see
+    prefetch_uploaded_file), its pages so far are replayed and the rest
+    follow as they come. Extraction errors are raised to the caller.
+    """
+    key, data, file_type = _upload_key(uploaded_file)
+    cached = _cached_extraction(key)
+    if cached is not None:
+        if on_progress:
+            on_progress(1, 1)
+        yield cached[0]
+        return
+
+    extraction = _join_extraction(key, data, file_type)
+    try:
+        yield from extraction.read(on_progress)
+    finally:
+        _leave_extraction(extraction)
+
+
+def prefetch_uploaded_file(uploaded_file, owner: str) -> str:
+    """
+    Start extracting an upload in the background before anyone asks for its
+    text, so iter_uploaded_file can pick up the pages already done.
+
+    owner (e.g. the session id) holds the extraction until it calls
+    cancel_prefetch with the returned key. Returns None for unsupported or
+    already cached files.
+    """
+    try:
+        key, data, file_type = _upload_key(uploaded_file)
+    except ValueError:
+        return None
+    if _memory_cache_get(key) is not None:
+        return None
+    with _extractions_lock:
+        running = key in _extractions
+    if not running and _cached_extraction(key) is not None:
+        return None
+    _join_extraction(key, data, file_type, owner)
+    return key
+
+
+def cancel_prefetch(key: str, owner: str):
+    """Drop owner's hold on a prefetch; it stops unless someone is reading it."""
+    with _extractions_lock:
+        extraction = _extractions.get(key)
+    if extraction is not None:
+        _leave_extraction(extraction, owner)
+
+
+def process_uploaded_file(uploaded_file, on_progress=None) -> tuple[str, str]:
     """
     Process an uploaded file and extract its text content.
-    
+
+    Results are cached by a hash of the file bytes, first in memory and then
+    in prompts.db, so re-uploading the same file skips extraction entirely.
+    on_progress(done, total) is called as pages/slides are extracted.
+
     Returns:
         tuple: (extracted_text, file_type)
     """
     if uploaded_file is None:
         return "", ""
-    
-    file_name = uploaded_file.name.lower()
-    
-    # Determine file type and extract text
-    if file_name.endswith('.pdf'):
-        text = extract_text_from_pdf(uploaded_file)
-        file_type = "PDF"
-    elif file_name.endswith(('.pptx', '.ppt')):
-        text = extract_text_from_pptx(uploaded_file)
-        file_type = "PowerPoint"
-    elif file_name.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-        text = extract_text_from_image(uploaded_file)
-        file_type = "Image"
-    else:
-        text = "Unsupported file type. Please upload PDF, PPTX, or image files."
-        file_type = "Unknown"
-    
-    return text, file_type
+
+    file_type = get_file_type(uploaded_file.name)
+    if file_type == "Unknown":
+        return "Unsupported file type. Please upload PDF, PPTX, or image files.", file_type
+
+    _, label, empty_message = _EXTRACTORS[file_type]
+    try:
+        segments = list(iter_uploaded_file(uploaded_file, on_progress))
+    except Exception as e:
+        return f"Error reading {label}: {str(e)}", file_type
+
+    return ("\n\n".join(segments) if segments else empty_message), file_type
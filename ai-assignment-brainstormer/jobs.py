@@ -0,0 +1,385 @@
+# Background jobs: generations and file analyses that outlive Streamlit reruns
+import itertools
+import os
+import queue
+import re
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from database import (
+    create_job, fail_unfinished_jobs, finish_job, get_job_record, get_unfinished_job_owners,
+    save_prompt_async, set_job_status
+)
+from kimi_api import current_session, generate_content_stream, in_current_session
+from response_cache import lookup_response, store_response
+from summarizer import MapReduceSummarizer
+
+# Jobs spend their time waiting on the model API (and on the tesseract
+# subprocess for OCR), so threads are enough; they also share the HTTP
+# clients, router stats and rate limiters with the rest of the process.
+# Each kind has its own pool, so a batch of uploads never holds up a
+# question. File jobs keep whole documents in memory and feed the OCR pool,
+# so fewer of them run at once.
+JOB_WORKERS = {
+    "generate": int(os.getenv("GENERATE_JOB_WORKERS", "16")),
+    "file": int(os.getenv("FILE_JOB_WORKERS", "4")),
+}
+PREVIEW_CHARS = 2000  # extracted text kept with a file job for its preview
+EXTRACTION_POLL_SECONDS = 0.5  # how often a file job waiting on pages checks for a cancel
+HISTORY_SAVE_TIMEOUT = 30.0  # seconds a job waits for its history row to be committed
+
+# Stored with every job, so recovery can tell this process's jobs from
+# those of a process that died (the token tells apart processes that got
+# the same pid, e.g. successive container starts)
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once the user has cancelled it."""
+
+
+class Job:
+    """Live state of a job running in this process."""
+
+    def __init__(self, job_id: str, kind: str, label: str, generation_type: str, session: str, seq: int):
+        self.id = job_id
+        self.seq = seq  # submission order; pools start jobs in this order
+        self.kind = kind
+        self.label = label
+        self.generation_type = generation_type
+        self.session = session  # rate limiter queue the job waits in
+        self.status = QUEUED
+        self.pieces = []  # answer written so far
+        self.result = None
+        self.files = None  # per-file extraction state of a file job
+        self.note = None
+        self.preview = None
+        self.error = None
+        self.history_id = None  # set once the answer is committed to history
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def stream(self, deltas) -> str:
+        """
+        Collect a streamed answer into the job as it is written; returns the
+        full text.
+
+        deltas should stop early once the job's cancel event is set (see
+        generate_content_stream), so a cancel lands even before the first
+        token; that early end raises JobCancelled here.
+        """
+        deltas = iter(deltas)
+        try:
+            for delta in deltas:
+                self.check_cancelled()
+                self.pieces.append(delta)
+            self.check_cancelled()
+        finally:
+            # Unsubscribes from the generation, which stops it if nobody else waits on it
+            if hasattr(deltas, "close"):
+                deltas.close()
+        return "".join(self.pieces)
+
+    def snapshot(self) -> dict:
+        text = self.result if self.result is not None else "".join(self.pieces)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "generation_type": self.generation_type,
+            "status": self.status,
+            "note": self.note,
+            "preview": self.preview,
+            "result": text,
+            "error": self.error,
+            "history_id": self.history_id,
+            "files": [dict(entry) for entry in self.files] if self.files else None,
+            "session": self.session,
+            "queue": None
+        }
+
+
+_executors = {}  # kind -> pool
+_jobs = {}  # id -> Job, while it is queued or running here
+_jobs_lock = threading.Lock()
+_job_seq = itertools.count()
+
+
+def _get_executor(kind: str) -> ThreadPoolExecutor:
+    with _jobs_lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            executor = _executors[kind] = ThreadPoolExecutor(
+                max_workers=JOB_WORKERS.get(kind, 4), thread_name_prefix=f"job-{kind}"
+            )
+        return executor
+
+
+def submit_job(kind: str, label: str, generation_type: str, work, *args) -> str:
+    """
+    Run work(job, *args) in the background and return the job's id.
+
+    work returns the final answer, which is stored with the job; anything it
+    raises marks the job as failed.
+    """
+    job = Job(uuid.uuid4().hex, kind, label, generation_type, current_session(), next(_job_seq))
+    create_job(job.id, kind, label, generation_type, PROCESS_OWNER)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    _get_executor(kind).submit(in_current_session(_run), job, work, args)
+    return job.id
+
+
+def _queue_position(job: Job) -> dict:
+    # Call with _jobs_lock held. Cancelled jobs still pass through the pool,
+    # but only for an instant, so they are not counted.
+    queued = [
+        other for other in _jobs.values()
+        if other.kind == job.kind and other.status == QUEUED and not other._cancel.is_set()
+    ]
+    ahead = sum(1 for other in queued if other.seq < job.seq)
+    return {"position": ahead + 1, "waiting": len(queued)}
+
+
+def _run(job: Job, work, args: tuple):
+    result = None
+    try:
+        job.check_cancelled()
+        job.status = RUNNING
+        set_job_status(job.id, RUNNING)
+        result = work(job, *args)
+        status = DONE
+    except JobCancelled:
+        status = CANCELLED
+    except Exception as e:
+        status = FAILED
+        job.error = str(e)
+        print(f"Job {job.id} ({job.kind}) failed: {e}")
+
+    if result is None and job.pieces:
+        result = "".join(job.pieces)  # keep what was written before a cancel/failure
+    try:
+        finish_job(job.id, status, result, job.note, job.preview, job.error, job.history_id)
+    finally:
+        # Readers switch to the stored row only once it is written
+        job.result = result
+        job.status = status
+        with _jobs_lock:
+            _jobs.pop(job.id, None)
+
+
+def get_job(job_id: str) -> dict:
+    """Current state of a job, live if it is running here; None if unknown."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            snapshot = job.snapshot()
+            if snapshot["status"] == QUEUED and not job._cancel.is_set():
+                snapshot["queue"] = _queue_position(job)
+            return snapshot
+
+    record = get_job_record(job_id)
+    if record is not None:
+        record.update(files=None, session=None, queue=None)
+    return record
+
+
+def cancel_job(job_id: str) -> bool:
+    """Ask a running job to stop; it keeps the answer written so far."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return False
+    job.cancel()
+    return True
+
+
+def _owner_is_dead(owner: str) -> bool:
+    if owner is None:
+        return True  # recorded before jobs had owners
+    if owner == PROCESS_OWNER:
+        return False
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False  # can't check another machine's processes
+    if int(pid) == os.getpid():
+        return True  # an earlier process that had our pid
+    if os.name == "nt":
+        return False  # os.kill would terminate the process, not probe it
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # alive, owned by another user
+    return False
+
+
+def recover_jobs():
+    """
+    Mark jobs whose process has died (e.g. before a restart) as failed.
+
+    Jobs of live processes, this one included, are left alone, so this is
+    safe to call again or from a second server sharing the database.
+    """
+    dead = [owner for owner in get_unfinished_job_owners() if _owner_is_dead(owner)]
+    if not dead:
+        return
+    count = fail_unfinished_jobs("Dihentikan karena server dimulai ulang. Silakan coba lagi.", dead)
+    if count:
+        print(f"Marked {count} interrupted jobs as failed")
+
+
+# Job bodies
+
+def _save_history(job: Job, topic: str, generation_type: str, result: str):
+    # Waits for the write-behind commit so the UI only says "saved" when it was;
+    # a failed save leaves the answer with the job and the reason in job.error
+    try:
+        job.history_id = save_prompt_async(topic, generation_type, result).result(HISTORY_SAVE_TIMEOUT)
+    except Exception as e:
+        job.error = f"Gagal menyimpan ke riwayat: {e}"
+        print(f"Job {job.id} could not save its history row: {e}")
+
+
+def run_generation(job: Job, topic: str, generation_type: str, refresh: bool = False) -> str:
+    """Answer a topic (from the response cache when possible) and save it to history."""
+    cached = None if refresh else lookup_response(topic, generation_type)
+    if cached:
+        result, match = cached
+        job.note = "♻️ Diambil dari cache" + (" (topik serupa)" if match == "similar" else "")
+    else:
+        result = job.stream(generate_content_stream(topic, generation_type, job._cancel))
+        store_response(topic, generation_type, result)
+
+    _save_history(job, topic, generation_type, result)
+    return result
+
+
+_END_OF_FILE = object()
+
+
+def _natural_key(name: str) -> list:
+    # "Minggu 2.pdf" sorts before "Minggu 10.pdf"
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name.lower())]
+
+
+def _read_file(job: Job, entry: dict, uploaded_file, segments: queue.Queue):
+    # Runs on its own thread so every file of a batch is extracted at once
+    from file_processor import iter_uploaded_file
+
+    def on_progress(done, total):
+        job.check_cancelled()
+        entry["progress"] = (done, total)
+
+    entry["status"] = "extracting"
+    try:
+        for segment in iter_uploaded_file(uploaded_file, on_progress):
+            segments.put(segment)
+        entry["status"] = "done"
+    except JobCancelled:
+        entry["status"] = "cancelled"
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = str(e)
+    finally:
+        segments.put(_END_OF_FILE)
+
+
+def run_file_analysis(job: Job, uploaded_files: list, generation_type: str) -> str:
+    """
+    Extract uploaded files, summarise them together and save the result to
+    history.
+
+    Files are extracted concurrently but fed to the summariser in name order,
+    each under its own heading, so the same batch always gives the same
+    prompt. The map-reduce summariser keeps every call within the token
+    budget however many files there are. A file that can't be read is
+    reported and skipped (text it gave before failing is flagged as partial);
+    the job fails if no file was read in full, or if a lone file failed.
+    """
+    # Document/OCR libraries are only loaded once a file is processed
+    from file_processor import get_file_type
+
+    files = sorted(uploaded_files, key=lambda f: _natural_key(f.name))
+    job.files = [
+        {"name": f.name, "type": get_file_type(f.name), "status": "waiting",
+         "progress": None, "chars": 0, "error": None}
+        for f in files
+    ]
+    queues = [queue.Queue() for _ in files]
+    readers = ThreadPoolExecutor(max_workers=len(files), thread_name_prefix="job-read")
+    for entry, uploaded_file, segments in zip(job.files, files, queues):
+        readers.submit(_read_file, job, entry, uploaded_file, segments)
+
+    # Pages go to the summariser as they are extracted, so long documents
+    # start their map step while the rest of the batch is still being read
+    summarizer = MapReduceSummarizer(generation_type, cancelled=job._cancel)
+    parts = []
+    try:
+        for entry, segments in zip(job.files, queues):
+            heading_sent = len(files) == 1  # a lone file needs no heading
+            while True:
+                try:
+                    segment = segments.get(timeout=EXTRACTION_POLL_SECONDS)
+                except queue.Empty:
+                    job.check_cancelled()
+                    continue
+                if segment is _END_OF_FILE:
+                    break
+                if not heading_sent:
+                    heading = f"## {entry['name']}"
+                    parts.append(heading)
+                    summarizer.feed(heading)
+                    heading_sent = True
+                entry["chars"] += len(segment)
+                parts.append(segment)
+                summarizer.feed(segment)
+            job.check_cancelled()
+    except JobCancelled:
+        summarizer.close()
+        raise
+    finally:
+        readers.shutdown(wait=False)
+
+    failed = [entry for entry in job.files if entry["status"] == "failed"]
+    read = [entry for entry in job.files if entry["chars"] and entry["status"] != "failed"]
+    if len(files) == 1 and failed:
+        # Summarising what came before the error would pass off part of the file as all of it
+        summarizer.close()
+        raise ValueError(f"Error reading {failed[0]['type']}: {failed[0]['error']}")
+    if not read:
+        summarizer.close()
+        errors = "; ".join(f"{entry['name']}: {entry['error'] or 'tidak ada teks'}" for entry in job.files)
+        if len(files) == 1:
+            raise ValueError("No text found in file.")
+        reason = "No file could be read in full" if failed else "No text found in the uploaded files"
+        raise ValueError(f"{reason} ({errors})")
+
+    extracted_text = "\n\n".join(parts)
+    if len(files) == 1:
+        job.note = f"📋 Teks dari {read[0]['type']} berhasil diekstrak ({len(extracted_text)} karakter)"
+        topic = f"[{read[0]['type']}] {read[0]['name']}"
+    else:
+        job.note = f"📋 Teks dari {len(read)} dari {len(files)} file berhasil diekstrak ({len(extracted_text)} karakter)"
+        for entry in job.files:
+            if entry in failed and entry["chars"]:
+                job.note += (f"\n\n⚠️ {entry['name']}: {entry['error']} (teks tidak lengkap: "
+                             f"{entry['chars']} karakter sebelum gagal ikut diringkas)")
+            elif entry not in read:
+                job.note += f"\n\n⚠️ {entry['name']}: {entry['error'] or 'tidak ada teks'}"
+        topic = f"[{len(read)} file] " + ", ".join(entry["name"] for entry in read)
+    job.preview = extracted_text[:PREVIEW_CHARS] + ("..." if len(extracted_text) > PREVIEW_CHARS else "")
+    result = job.stream(summarizer.finish_stream())
+    _save_history(job, topic, generation_type, result)
+    return result
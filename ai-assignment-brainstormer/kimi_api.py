@@ -1,12 +1,40 @@
 # AI API Configuration
 # Supports: Moonshot, OpenRouter, and Groq
+import asyncio
+import contextvars
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import streamlit as st
-from openai import OpenAI
 from dotenv import load_dotenv
+from model_router import get_router
+from rate_limiter import get_limiter, CANCEL_POLL_SECONDS, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
 
 load_dotenv()
 
+# HTTP connection pool shared by all requests to a provider
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # seconds
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))  # long answers take a while
+
+# Hedged requests: instead of waiting for each model to fail before trying
+# the next, ask HEDGE_IMMEDIATE models at once and add another model every
+# HEDGE_DELAY seconds (or as soon as one fails); the first answer wins
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0") == "1"
+HEDGE_IMMEDIATE = int(os.getenv("HEDGE_IMMEDIATE", "1"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "4"))  # seconds
+HEDGE_MAX_PARALLEL = int(os.getenv("HEDGE_MAX_PARALLEL", "3"))  # calls in flight per request
+HEDGE_USER_BUDGET = int(os.getenv("HEDGE_USER_BUDGET", "4"))  # calls in flight per user, all requests
+
+# Async API. Every non-streaming generation (sync or async) runs on one
+# background event loop that owns the async HTTP clients
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "32"))  # generations in flight at once
+ASYNC_TIMEOUT = float(os.getenv("ASYNC_TIMEOUT", "300"))  # seconds per generation, fallbacks included, quota waits not
+
 
 def get_api_config():
     """Get API configuration from Streamlit secrets or environment variables."""
@@ -71,16 +99,66 @@ def get_api_config():
     return None
 
 
+# base_url -> (api_key, client); clients live for the whole process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(config: dict):
+    # openai and httpx take ~0.6s to import; load them on the first request
+    # instead of on every cold start of the app
+    import httpx
+    from openai import OpenAI
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    )
+    return OpenAI(
+        api_key=config['api_key'],
+        base_url=config['base_url'],
+        http_client=http_client
+    )
+
+
 def get_client():
-    """Get OpenAI-compatible client for configured API."""
+    """
+    Get OpenAI-compatible client for configured API.
+
+    Clients are shared per provider so their HTTP connections (and TLS
+    sessions) are reused across requests and Streamlit reruns. A client is
+    replaced when the provider's API key changes.
+    """
     config = get_api_config()
     if not config:
         raise ValueError("No API key found. Set OPENROUTER_API_KEY, MOONSHOT_API_KEY, or GROQ_API_KEY in secrets or .env file.")
     
-    return OpenAI(
-        api_key=config['api_key'],
-        base_url=config['base_url']
-    ), config['model']
+    base_url = config['base_url']
+    with _clients_lock:
+        api_key, client = _clients.get(base_url, (None, None))
+        if api_key != config['api_key']:
+            # The old client is not closed: requests and streams still
+            # running on it finish, and its connections are released once
+            # the last of them drops its reference
+            client = _build_client(config)
+            _clients[base_url] = (config['api_key'], client)
+    
+    return client, config['model']
+
+
+def reset_clients():
+    """Close all cached clients; the next request builds fresh ones."""
+    with _clients_lock:
+        clients = [client for _, client in _clients.values()]
+        _clients.clear()
+    for client in clients:
+        client.close()
+    if _loop is not None:
+        asyncio.run_coroutine_threadsafe(_close_async_clients(), _loop).result()
 
 
 MODEL_LIST = [
@@ -94,88 +172,837 @@ MODEL_LIST = [
     "microsoft/phi-3-mini-128k-instruct:free",
 ]
 
-def generate_content_ai(prompt: str, system_prompt: str) -> str:
-    """Generate content using configured AI API with robust fallback."""
-    client, primary_model = get_client()
-    
-    # If using OpenRouter, try fallback models if the primary fails
-    models_to_try = [primary_model]
+# Context window (prompt + answer, in tokens) of the models we route to
+MODEL_CONTEXT_WINDOWS = {
+    "deepseek/deepseek-r1:free": 163840,
+    "deepseek/deepseek-chat:free": 163840,
+    "qwen/qwen-2-7b-instruct:free": 32768,
+    "meta-llama/llama-3.2-1b-instruct:free": 131072,
+    "meta-llama/llama-3-8b-instruct:free": 8192,
+    "google/gemma-2-9b-it:free": 8192,
+    "mistralai/mistral-7b-instruct:free": 32768,
+    "microsoft/phi-3-mini-128k-instruct:free": 128000,
+    "gemini-1.5-flash": 1048576,
+    "kimi-k2-0711-preview": 131072,
+    "llama-3.3-70b-versatile": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192  # assumed for models not listed above
+
+MAX_OUTPUT_TOKENS = 4096  # answer budget when the window has room
+MIN_OUTPUT_TOKENS = 512  # below this the answer would be cut off, so use another model
+MESSAGE_OVERHEAD_TOKENS = 16  # chat template tokens around the two messages
+TOKEN_SAFETY_MARGIN = 1.1  # the estimate is approximate; leave headroom
+TRUNCATION_MARKER = "\n\n[... sebagian teks dipotong karena terlalu panjang ...]\n\n"
+
+_tokenizer = None
+
+
+def set_tokenizer(tokenizer):
+    """
+    Use a real tokenizer for token counts, e.g. a tiktoken encoding's
+    encode method. tokenizer(text) must return a list of tokens;
+    None restores the character heuristic.
+    """
+    global _tokenizer
+    _tokenizer = tokenizer
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count for budgeting (about 4 characters per token unless a tokenizer is set)."""
+    if _tokenizer is not None:
+        return len(_tokenizer(text))
+    return len(text) // 4 + 1
+
+
+def get_context_window(model: str) -> int:
+    """Context window of a model in tokens."""
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def max_prompt_tokens(model: str, output_tokens: int = MAX_OUTPUT_TOKENS) -> int:
+    """Largest prompt (system + user) that still leaves output_tokens for the answer."""
+    usable = int(get_context_window(model) / TOKEN_SAFETY_MARGIN)
+    return usable - MESSAGE_OVERHEAD_TOKENS - output_tokens
+
+
+def output_budget(model: str, prompt_tokens: int) -> int:
+    """max_tokens to request for a prompt of prompt_tokens, or 0 if it does not fit."""
+    available = max_prompt_tokens(model, 0) - prompt_tokens
+    if available < MIN_OUTPUT_TOKENS:
+        return 0
+    return min(MAX_OUTPUT_TOKENS, available)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to about max_tokens, keeping its beginning and end
+    (introduction and conclusion usually matter most).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    marker_tokens = estimate_tokens(TRUNCATION_MARKER)
+    # Scale by the measured chars/token ratio; shrink until it fits (one or
+    # two rounds with the heuristic, a few more with a real tokenizer)
+    keep = int(len(text) * (max_tokens - marker_tokens) / estimate_tokens(text))
+    while keep > 0:
+        head = keep * 2 // 3
+        shortened = text[:head] + TRUNCATION_MARKER + text[len(text) - (keep - head):]
+        if estimate_tokens(shortened) <= max_tokens:
+            return shortened
+        keep = int(keep * 0.9)
+    return text[:max(0, max_tokens) * 4]
+
+
+def plan_request(models: list, prompt: str, system_prompt: str) -> list:
+    """
+    Decide how to send a prompt so it fits each model's context window.
+
+    Returns (model, prompt, max_tokens) attempts in fallback order. Models
+    that can take the whole prompt with a full answer budget come first,
+    then those that fit with a shorter answer (keeping models' relative
+    order). If no model can take the prompt, it is trimmed for the models
+    with the largest window instead of sending a request that would fail.
+    """
+    system_tokens = estimate_tokens(system_prompt)
+    prompt_tokens = system_tokens + estimate_tokens(prompt)
+
+    full, reduced = [], []
+    for model in models:
+        max_tokens = output_budget(model, prompt_tokens)
+        if max_tokens >= MAX_OUTPUT_TOKENS:
+            full.append((model, prompt, max_tokens))
+        elif max_tokens:
+            reduced.append((model, prompt, max_tokens))
+    if full or reduced:
+        return full + reduced
+
+    largest = max(get_context_window(model) for model in models)
+    attempts = []
+    for model in models:
+        if get_context_window(model) == largest:
+            budget = max_prompt_tokens(model) - system_tokens
+            trimmed = truncate_to_tokens(prompt, budget)
+            attempts.append((model, trimmed, output_budget(model, system_tokens + estimate_tokens(trimmed))))
+    print(f"Prompt of ~{prompt_tokens} tokens exceeds every model's context window; trimmed to fit {largest}")
+    return attempts
+
+
+def _is_context_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return "context" in message and ("length" in message or "window" in message or "too long" in message)
+
+
+def _models_to_try(client, primary_model: str) -> list:
+    # If using OpenRouter, try fallback models if the primary fails,
+    # fastest healthy model first
     if "openrouter" in str(client.base_url):
-        models_to_try = MODEL_LIST  # Try all known free models
-    else:
-         models_to_try = [primary_model]
-         
+        return get_router().rank(MODEL_LIST)  # Try all known free models
+    return [primary_model]
+
+
+# Session an LLM call is made for, when it runs outside the Streamlit script
+# thread (stream pumps, summariser workers); see in_current_session
+_session = contextvars.ContextVar("session", default=None)
+
+
+def current_session() -> str:
+    """Id of the Streamlit session making the current call ("default" outside one)."""
+    session = _session.get()
+    if session:
+        return session
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else "default"
+    except Exception:
+        return "default"
+
+
+def in_current_session(fn):
+    """Wrap fn so calls from a worker thread are queued as the caller's session."""
+    session = current_session()
+
+    def run(*args, **kwargs):
+        _session.set(session)
+        return fn(*args, **kwargs)
+    return run
+
+
+def _wait_for_quota(client, model: str, prompt: str, system_prompt: str, priority: int, session: str = None,
+                    cancelled: threading.Event = None) -> bool:
+    # Prompt tokens are reserved up front; the answer is charged once its size is known.
+    # False if cancelled was set before a slot came free (nothing is reserved then)
+    tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+    return get_limiter(client.base_url, model).acquire(session or current_session(), tokens, priority, cancelled)
+
+
+def _charge_answer(client, model: str, text: str):
+    get_limiter(client.base_url, model).charge(estimate_tokens(text) if text else 0)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+_async_slots = None  # semaphore bounding generations on the loop
+_async_clients = {}  # base_url -> (api_key, client); only touched on the loop
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            # Quota waits, request planning and hedged requests hold a thread
+            # each while they run; give every slot one
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=ASYNC_MAX_CONCURRENCY, thread_name_prefix="ai-quota"))
+            threading.Thread(target=loop.run_forever, name="ai-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _build_async_client(config: dict):
+    import httpx
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    )
+    return AsyncOpenAI(
+        api_key=config['api_key'],
+        base_url=config['base_url'],
+        http_client=http_client
+    )
+
+
+async def get_async_client():
+    """Like get_client, for the AsyncOpenAI client of the background loop."""
+    config = get_api_config()
+    if not config:
+        raise ValueError("No API key found. Set OPENROUTER_API_KEY, MOONSHOT_API_KEY, or GROQ_API_KEY in secrets or .env file.")
+
+    base_url = config['base_url']
+    api_key, client = _async_clients.get(base_url, (None, None))
+    if api_key != config['api_key']:
+        # As in get_client, calls still running on the old client finish on it
+        client = _build_async_client(config)
+        _async_clients[base_url] = (config['api_key'], client)
+
+    return client, config['model']
+
+
+async def _close_async_clients():
+    clients = [client for _, client in _async_clients.values()]
+    _async_clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def _plan_attempts(models: list, prompt: str, system_prompt: str) -> list:
+    # plan_request plus the quota tokens of each attempt. Counting tokens of
+    # a long prompt (with a real tokenizer especially) takes a while, so the
+    # async path runs this off the loop
+    system_tokens = estimate_tokens(system_prompt)
+    counted = {}
+    attempts = []
+    for model, model_prompt, max_tokens in plan_request(models, prompt, system_prompt):
+        if model_prompt not in counted:
+            counted[model_prompt] = system_tokens + estimate_tokens(model_prompt)
+        attempts.append((model, model_prompt, max_tokens, counted[model_prompt]))
+    return attempts
+
+
+async def _await_quota(client, model: str, tokens: int, priority: int):
+    limiter = get_limiter(client.base_url, model)
+    if limiter.try_acquire(current_session(), tokens, priority):
+        return
+    cancelled = threading.Event()
+    try:
+        await asyncio.to_thread(limiter.acquire, current_session(), tokens, priority, cancelled)
+    finally:
+        # Cancelled or timed out while queued: the waiting thread leaves the
+        # queue without taking a slot
+        cancelled.set()
+
+
+async def _agenerate_content_ai(prompt: str, system_prompt: str, timeout: float) -> str:
+    # One upstream generation: models in router order, each planned to fit
+    # its window. timeout covers time spent on upstream calls; waiting for
+    # quota doesn't count against it
+    if HEDGE_REQUESTS:
+        cancelled = threading.Event()
+        try:
+            return await asyncio.to_thread(
+                in_current_session(generate_content_ai_hedged), prompt, system_prompt, None, timeout, cancelled
+            )
+        finally:
+            cancelled.set()  # stops every call of a request that was cancelled
+
+    client, primary_model = await get_async_client()
+    models_to_try = _models_to_try(client, primary_model)
+
     last_error = None
-    
-    for model in models_to_try:
+    too_small = 0  # largest context window that rejected the prompt
+    remaining = timeout
+
+    for model, model_prompt, max_tokens, tokens in await asyncio.to_thread(
+        _plan_attempts, models_to_try, prompt, system_prompt
+    ):
+        if get_context_window(model) <= too_small:
+            continue  # would fail the same way
+        await _await_quota(client, model, tokens, PRIORITY_BACKGROUND)
+        start = time.perf_counter()
         try:
-            response = client.chat.completions.create(
+            response = await asyncio.wait_for(client.chat.completions.create(
                 model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
+                    {"role": "user", "content": model_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=4096
-            )
+                max_tokens=max_tokens
+            ), remaining)
+            get_router().record_success(model, time.perf_counter() - start)
+            _charge_answer(client, model, response.choices[0].message.content)
             return response.choices[0].message.content
-            
+
+        except asyncio.TimeoutError:
+            get_router().record_failure(model, TimeoutError(f"No answer within {remaining:.1f}s"))
+            # The provider may still write the abandoned answer in full
+            get_limiter(client.base_url, model).charge(max_tokens)
+            raise ValueError(f"AI request timed out after {timeout:g}s.") from None
         except Exception as e:
             last_error = e
+            get_router().record_failure(model, e)
             print(f"Model {model} failed: {e}")
+            if _is_context_error(e):
+                too_small = max(too_small, get_context_window(model))
+            remaining -= time.perf_counter() - start
             continue
-            
+
     # If all models fail
     raise ValueError(f"All AI models failed. Last error: {last_error}. Please check API keys or service status.")
 
 
-def generate_outline(topic: str) -> str:
-    """Generate an assignment outline for the given topic."""
-    system_prompt = """You are an academic assistant helping Indonesian university students. 
-    Create detailed assignment outlines with clear sections, bullet points, and suggestions.
-    Respond in the same language as the user's input (Indonesian or English)."""
-    
-    return generate_content_ai(
-        f"Create a comprehensive outline for an assignment about: {topic}",
-        system_prompt
+async def _run_generation(prompt: str, system_prompt: str, session: str, timeout: float) -> str:
+    # Runs on the background loop; tasks there don't inherit the caller's context
+    global _async_slots
+    _session.set(session)
+    if _async_slots is None:
+        _async_slots = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    async with _async_slots:
+        return await _agenerate_content_ai(prompt, system_prompt, timeout)
+
+
+def _generate_content_ai(prompt: str, system_prompt: str, timeout: float = ASYNC_TIMEOUT) -> str:
+    # Blocking wrapper around _run_generation for threads without an event loop
+    future = asyncio.run_coroutine_threadsafe(
+        _run_generation(prompt, system_prompt, current_session(), timeout), _get_loop()
     )
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+async def _agenerate_on_loop(prompt: str, system_prompt: str, timeout: float) -> str:
+    # Awaitable from any event loop; cancelling the caller cancels the upstream call
+    coro = _run_generation(prompt, system_prompt, current_session(), timeout)
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return await asyncio.ensure_future(coro)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+_hedge_inflight = {}  # user -> model calls in flight
+_hedge_lock = threading.Lock()
+
+
+def _take_hedge_slot(user: str, force: bool = False) -> bool:
+    with _hedge_lock:
+        if not force and _hedge_inflight.get(user, 0) >= HEDGE_USER_BUDGET:
+            return False
+        _hedge_inflight[user] = _hedge_inflight.get(user, 0) + 1
+        return True
+
 
+def _release_hedge_slot(user: str):
+    with _hedge_lock:
+        _hedge_inflight[user] -= 1
+        if not _hedge_inflight[user]:
+            del _hedge_inflight[user]
 
-def generate_code_snippet(topic: str) -> str:
-    """Generate code snippets for the given programming topic."""
-    system_prompt = """You are a coding tutor for Indonesian university students.
+
+def _hedged_call(client, model: str, prompt: str, system_prompt: str, max_tokens: int,
+                 cancelled: threading.Event, user: str, granted: list):
+    """
+    One model's attempt in a hedged request. Streams internally so a losing
+    call can stop (and free its connection) as soon as another one has won.
+    """
+    parts = []
+    try:
+        # A loser still queued for quota leaves the queue without using a request
+        if not _wait_for_quota(client, model, prompt, system_prompt, PRIORITY_BACKGROUND, user, cancelled):
+            return None
+        if cancelled.is_set():
+            return None
+        start = time.perf_counter()
+        granted.append(start)
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        with stream:
+            for chunk in stream:
+                if cancelled.is_set():
+                    return None
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+        get_router().record_success(model, time.perf_counter() - start)
+        return "".join(parts)
+    except Exception as e:
+        if not cancelled.is_set():
+            get_router().record_failure(model, e)
+        raise
+    finally:
+        _charge_answer(client, model, "".join(parts))
+        _release_hedge_slot(user)
+
+
+def generate_content_ai_hedged(prompt: str, system_prompt: str, user: str = None, timeout: float = None,
+                               cancelled: threading.Event = None) -> str:
+    """
+    Like generate_content_ai, but races fallback models instead of trying
+    them one after another.
+
+    The first HEDGE_IMMEDIATE models start at once; another starts whenever
+    HEDGE_DELAY passes without an answer or a call fails, up to
+    HEDGE_MAX_PARALLEL per request and HEDGE_USER_BUDGET per user (a
+    request always gets at least one call). The first answer is returned and
+    the other calls are cancelled.
+
+    timeout (seconds) runs from the first call that gets its quota; setting
+    cancelled from another thread abandons the request. Either raises
+    ValueError and stops every call.
+    """
+    client, primary_model = get_client()
+    user = user or current_session()
+    queue = plan_request(_models_to_try(client, primary_model), prompt, system_prompt)
+    if cancelled is None:
+        cancelled = threading.Event()
+    granted = []  # start times of calls that got their quota
+    pending = {}  # future -> model
+    last_error = None
+
+    def launch(force: bool = False) -> bool:
+        if not queue or len(pending) >= HEDGE_MAX_PARALLEL or not _take_hedge_slot(user, force):
+            return False
+        model, model_prompt, max_tokens = queue.pop(0)
+        future = _hedge_executor.submit(
+            _hedged_call, client, model, model_prompt, system_prompt, max_tokens, cancelled, user, granted
+        )
+        pending[future] = model
+        return True
+
+    try:
+        launch(force=True)
+        for _ in range(HEDGE_IMMEDIATE - 1):
+            launch()
+        last_launch = time.perf_counter()
+
+        while pending:
+            poll = HEDGE_DELAY - (time.perf_counter() - last_launch) if queue else None
+            # Wake up now and then to notice a cancel or the timeout
+            poll = CANCEL_POLL_SECONDS if poll is None else max(0.0, min(poll, CANCEL_POLL_SECONDS))
+            done, _ = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"Model {model} failed: {e}")
+                    if _is_context_error(e):
+                        # Drop queued models that would fail the same way
+                        window = get_context_window(model)
+                        queue[:] = [attempt for attempt in queue if get_context_window(attempt[0]) > window]
+            if cancelled.is_set():
+                raise ValueError("AI request cancelled.")
+            if timeout is not None and granted and time.perf_counter() - granted[0] > timeout:
+                raise ValueError(f"AI request timed out after {timeout:g}s.")
+            # Slow or failed: bring in the next model
+            if done or not pending or time.perf_counter() - last_launch >= HEDGE_DELAY:
+                launch(force=not pending)
+                last_launch = time.perf_counter()
+    finally:
+        cancelled.set()
+
+    # If all models fail
+    raise ValueError(f"All AI models failed. Last error: {last_error}. Please check API keys or service status.")
+
+
+# Sent to the next model when a stream breaks off part-way
+CONTINUE_PROMPT = "Lanjutkan jawaban di atas tepat dari kata terakhir. Jangan ulangi teks yang sudah ditulis."
+
+
+def _generate_content_ai_stream(prompt: str, system_prompt: str, cancelled: threading.Event = None):
+    # One upstream streamed generation. If a model fails mid-answer, the next
+    # model is asked to continue from the text already yielded, so the
+    # joined pieces still form one answer. Setting cancelled ends it, even
+    # while it still waits for quota (no slot is taken then).
+    client, primary_model = get_client()
+    models_to_try = _models_to_try(client, primary_model)
+
+    last_error = None
+    too_small = 0  # largest context window that rejected the prompt
+    written = []  # pieces already yielded
+
+    for model, model_prompt, max_tokens in plan_request(models_to_try, prompt, system_prompt):
+        if get_context_window(model) <= too_small:
+            continue  # would fail the same way
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": model_prompt}
+        ]
+        if written:
+            messages += [
+                {"role": "assistant", "content": "".join(written)},
+                {"role": "user", "content": CONTINUE_PROMPT}
+            ]
+        if not _wait_for_quota(client, model, model_prompt, system_prompt, PRIORITY_INTERACTIVE, None, cancelled):
+            return
+        if cancelled is not None and cancelled.is_set():
+            return
+        answered = len(written)
+        start = time.perf_counter()
+        try:
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            with stream:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        written.append(delta)
+                        yield delta
+            get_router().record_success(model, time.perf_counter() - start)
+            return
+
+        except Exception as e:
+            last_error = e
+            get_router().record_failure(model, e)
+            print(f"Model {model} failed{' mid-stream' if written else ''}: {e}")
+            if _is_context_error(e):
+                too_small = max(too_small, get_context_window(model))
+            continue
+        finally:
+            _charge_answer(client, model, "".join(written[answered:]))
+
+    # If all models fail
+    raise ValueError(f"All AI models failed. Last error: {last_error}. Please check API keys or service status.")
+
+
+# Single-flight: identical requests that are in flight at the same time
+# (a whole class submitting the same topic) share one upstream call.
+# key -> Future for complete answers, _StreamFlight for streams
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _LeaderAborted(Exception):
+    """The caller making the shared request was interrupted; followers retry."""
+
+
+def _flight_key(kind: str, prompt: str, system_prompt: str) -> str:
+    config = get_api_config() or {}
+    parts = [kind, config.get('base_url', ''), config.get('model', ''), system_prompt, prompt]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def generate_content_ai(prompt: str, system_prompt: str) -> str:
+    """Generate content using configured AI API with robust fallback."""
+    key = _flight_key("complete", prompt, system_prompt)
+    while True:
+        with _flights_lock:
+            future = _flights.get(key)
+            leader = future is None
+            if leader:
+                future = _flights[key] = Future()
+
+        if not leader:
+            try:
+                return future.result()
+            except _LeaderAborted:
+                continue
+
+        try:
+            future.set_result(_generate_content_ai(prompt, system_prompt))
+        except Exception as e:
+            future.set_exception(e)
+        except BaseException:
+            future.set_exception(_LeaderAborted())
+            raise
+        finally:
+            with _flights_lock:
+                del _flights[key]
+        return future.result()
+
+
+async def agenerate_content_ai(prompt: str, system_prompt: str, timeout: float = ASYNC_TIMEOUT) -> str:
+    """
+    Async generate_content_ai: same fallback, routing and coalescing, without
+    holding a thread for the HTTP call. At most ASYNC_MAX_CONCURRENCY
+    generations run at once; one taking longer than timeout seconds raises
+    ValueError, and cancelling the awaiting task cancels the upstream call.
+    """
+    key = _flight_key("complete", prompt, system_prompt)
+    while True:
+        with _flights_lock:
+            future = _flights.get(key)
+            leader = future is None
+            if leader:
+                future = _flights[key] = Future()
+
+        if not leader:
+            try:
+                # shield: one follower giving up must not cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderAborted:
+                continue
+
+        try:
+            future.set_result(await _agenerate_on_loop(prompt, system_prompt, timeout))
+        except Exception as e:
+            future.set_exception(e)
+        except BaseException:
+            future.set_exception(_LeaderAborted())
+            raise
+        finally:
+            with _flights_lock:
+                del _flights[key]
+        return future.result()
+
+
+class _StreamFlight:
+    """
+    One upstream stream, pumped by a background thread into a buffer that
+    every subscriber reads from. Late subscribers get the buffered pieces
+    replayed first. If every subscriber leaves early, the upstream call is
+    stopped.
+    """
+
+    def __init__(self, key: str, source, cancelled: threading.Event):
+        self.key = key
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancelled = cancelled  # set when every subscriber has left; source must watch it too
+        self.session = current_session()  # the pump thread queues as this session
+        self._source = source
+        self._cond = threading.Condition()
+
+    def join(self) -> bool:
+        """Register a subscriber; False if the flight was already abandoned."""
+        with self._cond:
+            if self.cancelled.is_set():
+                return False
+            self.subscribers += 1
+            return True
+
+    def start(self):
+        threading.Thread(target=self._pump, name="stream-flight", daemon=True).start()
+
+    def _pump(self):
+        _session.set(self.session)
+        try:
+            for piece in self._source:
+                with self._cond:
+                    if self.cancelled.is_set():
+                        break
+                    self.pieces.append(piece)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._source.close()
+            with _flights_lock:
+                if _flights.get(self.key) is self:
+                    del _flights[self.key]
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def subscribe(self, cancelled: threading.Event = None):
+        """
+        Yield every piece of the answer, from the start.
+
+        Ends early, without an error, once the caller sets cancelled, even
+        while no piece has arrived yet.
+        """
+        position = 0
+        try:
+            while True:
+                with self._cond:
+                    while position == len(self.pieces) and not self.done:
+                        if cancelled is not None and cancelled.is_set():
+                            return
+                        self._cond.wait(CANCEL_POLL_SECONDS if cancelled is not None else None)
+                    pieces = self.pieces[position:]
+                    position += len(pieces)
+                    finished = self.done and position == len(self.pieces)
+                yield from pieces
+                if finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                if not self.subscribers and not self.done:
+                    self.cancelled.set()
+
+
+def generate_content_ai_stream(prompt: str, system_prompt: str, cancelled: threading.Event = None):
+    """
+    Like generate_content_ai, but yields the answer in pieces as the model
+    writes it.
+
+    Setting cancelled ends the pieces early (check it afterwards to tell a
+    cancel from the end of the answer). The upstream call stops, or never
+    leaves the rate-limit queue, once nobody else is reading it.
+    """
+    key = _flight_key("stream", prompt, system_prompt)
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is None or not flight.join():
+            abandoned = threading.Event()
+            flight = _flights[key] = _StreamFlight(
+                key, _generate_content_ai_stream(prompt, system_prompt, abandoned), abandoned
+            )
+            flight.join()
+            flight.start()
+    return flight.subscribe(cancelled)
+
+
+OUTLINE_SYSTEM_PROMPT = """You are an academic assistant helping Indonesian university students. 
+    Create detailed assignment outlines with clear sections, bullet points, and suggestions.
+    Respond in the same language as the user's input (Indonesian or English)."""
+OUTLINE_PROMPT = "Create a comprehensive outline for an assignment about: {topic}"
+
+CODE_SYSTEM_PROMPT = """You are a coding tutor for Indonesian university students.
     Generate clean, well-commented code snippets with explanations.
     Include examples and best practices. Use appropriate programming language based on context."""
-    
-    return generate_content_ai(
-        f"Generate code snippets and examples for: {topic}",
-        system_prompt
-    )
-
+CODE_PROMPT = "Generate code snippets and examples for: {topic}"
 
-def generate_essay_structure(topic: str) -> str:
-    """Generate an essay structure for the given topic."""
-    system_prompt = """You are an academic writing assistant for Indonesian university students.
+ESSAY_SYSTEM_PROMPT = """You are an academic writing assistant for Indonesian university students.
     Create detailed essay structures with thesis statement, body paragraphs, and conclusion.
     Include suggested arguments, evidence to look for, and transition phrases.
     Respond in the same language as the user's input."""
-    
-    return generate_content_ai(
-        f"Create a detailed essay structure for: {topic}",
-        system_prompt
-    )
+ESSAY_PROMPT = "Create a detailed essay structure for: {topic}"
+
+# generation_type -> (prompt template, system prompt)
+GENERATION_PROMPTS = {
+    "outline": (OUTLINE_PROMPT, OUTLINE_SYSTEM_PROMPT),
+    "code": (CODE_PROMPT, CODE_SYSTEM_PROMPT),
+    "essay": (ESSAY_PROMPT, ESSAY_SYSTEM_PROMPT),
+}
+
+
+def generate_outline(topic: str, stream: bool = False):
+    """Generate an assignment outline for the given topic (a delta generator if stream)."""
+    ai = generate_content_ai_stream if stream else generate_content_ai
+    return ai(OUTLINE_PROMPT.format(topic=topic), OUTLINE_SYSTEM_PROMPT)
+
+
+def generate_code_snippet(topic: str, stream: bool = False):
+    """Generate code snippets for the given programming topic (a delta generator if stream)."""
+    ai = generate_content_ai_stream if stream else generate_content_ai
+    return ai(CODE_PROMPT.format(topic=topic), CODE_SYSTEM_PROMPT)
+
+
+def generate_essay_structure(topic: str, stream: bool = False):
+    """Generate an essay structure for the given topic (a delta generator if stream)."""
+    ai = generate_content_ai_stream if stream else generate_content_ai
+    return ai(ESSAY_PROMPT.format(topic=topic), ESSAY_SYSTEM_PROMPT)
+
+
+GENERATORS = {
+    "outline": generate_outline,
+    "code": generate_code_snippet,
+    "essay": generate_essay_structure
+}
 
 
 def generate_content(topic: str, generation_type: str) -> str:
     """Main function to generate content based on type."""
-    generators = {
-        "outline": generate_outline,
-        "code": generate_code_snippet,
-        "essay": generate_essay_structure
-    }
-    
-    generator = generators.get(generation_type)
+    generator = GENERATORS.get(generation_type)
     if not generator:
         raise ValueError(f"Unknown generation type: {generation_type}")
     
     return generator(topic)
+
+
+def generate_content_stream(topic: str, generation_type: str, cancelled: threading.Event = None):
+    """
+    Like generate_content, but yields the answer in pieces as it is written
+    (stopping early once cancelled is set; see generate_content_ai_stream).
+    """
+    if generation_type not in GENERATION_PROMPTS:
+        raise ValueError(f"Unknown generation type: {generation_type}")
+
+    template, system_prompt = GENERATION_PROMPTS[generation_type]
+    return generate_content_ai_stream(template.format(topic=topic), system_prompt, cancelled)
+
+
+async def agenerate_outline(topic: str) -> str:
+    """Async generate_outline."""
+    return await agenerate_content_ai(OUTLINE_PROMPT.format(topic=topic), OUTLINE_SYSTEM_PROMPT)
+
+
+async def agenerate_code_snippet(topic: str) -> str:
+    """Async generate_code_snippet."""
+    return await agenerate_content_ai(CODE_PROMPT.format(topic=topic), CODE_SYSTEM_PROMPT)
+
+
+async def agenerate_essay_structure(topic: str) -> str:
+    """Async generate_essay_structure."""
+    return await agenerate_content_ai(ESSAY_PROMPT.format(topic=topic), ESSAY_SYSTEM_PROMPT)
+
+
+ASYNC_GENERATORS = {
+    "outline": agenerate_outline,
+    "code": agenerate_code_snippet,
+    "essay": agenerate_essay_structure
+}
+
+
+async def agenerate_content(topic: str, generation_type: str) -> str:
+    """Async generate_content, e.g. for several topics or output types at once."""
+    generator = ASYNC_GENERATORS.get(generation_type)
+    if not generator:
+        raise ValueError(f"Unknown generation type: {generation_type}")
+
+    return await generator(topic)
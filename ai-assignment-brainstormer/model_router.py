@@ -0,0 +1,164 @@
+# Adaptive model routing: per-model health/latency stats and circuit breakers
+import threading
+import time
+from collections import deque
+
+LATENCY_WINDOW = 50  # recent successful calls kept per model for p50/p95
+ERROR_WINDOW = 5  # recent errors kept per model
+SUCCESS_EWMA_ALPHA = 0.2  # weight of the newest outcome in the success rate
+UNTRIED_LATENCY = 10.0  # assumed p50 (seconds) of a model with no successes yet
+
+# Circuit breaker: after BREAKER_THRESHOLD consecutive provider failures
+# (429, 5xx, timeouts, connection errors) a model is skipped for a cooldown,
+# then one request is let through as a probe. A failed probe doubles the
+# cooldown up to BREAKER_MAX_COOLDOWN.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 30.0  # seconds
+BREAKER_MAX_COOLDOWN = 600.0
+PROBE_TIMEOUT = 120.0  # a probe that never reported back frees its slot after this
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """True for errors that say the model/provider is unhealthy, not the request."""
+    import httpx
+    import openai
+
+    # Timeouts, broken streams, and calls that missed our own deadline (TimeoutError)
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+class ModelStats:
+    """Health and latency record of one model."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.errors = deque(maxlen=ERROR_WINDOW)  # (timestamp, message)
+        self.success_rate = 1.0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.cooldown = BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self.probe_started = None
+
+    def percentile(self, fraction: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def expected_latency(self) -> float:
+        """p50 scaled by how often the model fails (a failure means trying another one)."""
+        p50 = self.percentile(0.5)
+        if p50 is None:
+            p50 = UNTRIED_LATENCY
+        return p50 / max(self.success_rate, 0.05)
+
+
+class ModelRouter:
+    """
+    Orders fallback models by expected latency and keeps unhealthy ones out
+    of the way with per-model circuit breakers.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats()
+        return stats
+
+    def rank(self, models: list) -> list:
+        """
+        Return models in the order they should be tried.
+
+        A model whose cooldown has passed goes first as the breaker's probe;
+        healthy models follow, fastest expected first (ties keep the given
+        order). Models with an open breaker come last, only as a last resort.
+        """
+        now = self._clock()
+        probes, healthy, tripped = [], [], []
+        with self._lock:
+            for model in models:
+                stats = self._get(model)
+                if stats.state == CLOSED:
+                    healthy.append(model)
+                    continue
+                probe_running = stats.probe_started is not None and now - stats.probe_started < PROBE_TIMEOUT
+                if now - stats.opened_at >= stats.cooldown and not probe_running:
+                    stats.state = HALF_OPEN
+                    stats.probe_started = now
+                    probes.append(model)
+                else:
+                    tripped.append(model)
+            healthy.sort(key=lambda model: self._stats[model].expected_latency())
+            tripped.sort(key=lambda model: self._stats[model].opened_at + self._stats[model].cooldown)
+        return probes + healthy + tripped
+
+    def record_success(self, model: str, seconds: float):
+        with self._lock:
+            stats = self._get(model)
+            stats.calls += 1
+            stats.latencies.append(seconds)
+            stats.success_rate += SUCCESS_EWMA_ALPHA * (1.0 - stats.success_rate)
+            stats.consecutive_failures = 0
+            if stats.state != CLOSED:
+                print(f"Model {model} recovered; closing its circuit breaker")
+            stats.state = CLOSED
+            stats.cooldown = BREAKER_COOLDOWN
+            stats.probe_started = None
+
+    def record_failure(self, model: str, error: Exception):
+        with self._lock:
+            stats = self._get(model)
+            stats.calls += 1
+            stats.errors.append((time.time(), str(error)[:200]))
+            if not is_provider_failure(error):
+                return  # bad request, auth, context length: not the model's health
+            stats.success_rate -= SUCCESS_EWMA_ALPHA * stats.success_rate
+            stats.consecutive_failures += 1
+            if stats.state == HALF_OPEN:
+                stats.cooldown = min(stats.cooldown * 2, BREAKER_MAX_COOLDOWN)
+            elif stats.state == OPEN or stats.consecutive_failures < BREAKER_THRESHOLD:
+                return
+            stats.state = OPEN
+            stats.opened_at = self._clock()
+            stats.probe_started = None
+            print(f"Model {model} tripped its circuit breaker for {stats.cooldown:.0f}s")
+
+    def snapshot(self) -> dict:
+        """Per-model stats for display or logging."""
+        with self._lock:
+            return {
+                model: {
+                    "state": stats.state,
+                    "calls": stats.calls,
+                    "success_rate": round(stats.success_rate, 3),
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                    "recent_errors": [message for _, message in stats.errors],
+                }
+                for model, stats in self._stats.items()
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Return the process-wide router, whose stats outlive Streamlit reruns."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
@@ -0,0 +1,151 @@
+# Parallel OCR engine: runs tesseract workers in a process pool
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import pytesseract
+
+OCR_LANG = "eng+ind"  # English + Indonesian
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+
+# Tall images are cut into horizontal bands that are OCR'd in parallel
+TILE_MIN_HEIGHT = 1000  # no band is made shorter than this (pixels)
+TILE_CUT_SEARCH = 0.15  # fraction of a band searched for a blank row to cut at
+
+
+def _init_worker():
+    # One core per worker: let the pool provide the parallelism
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_tile(data: bytes, lang: str) -> tuple:
+    """OCR one PNG-encoded tile (runs inside a worker process); returns (text, seconds)."""
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(Image.open(io.BytesIO(data)), lang=lang)
+    return text, time.perf_counter() - start
+
+
+def _encode(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def split_into_bands(image: Image.Image, bands: int) -> list:
+    """
+    Cut an image into horizontal bands, in reading order.
+
+    Each cut is moved to the lightest row near its target position, so it
+    falls between text lines instead of through them.
+    """
+    width, height = image.size
+    if bands <= 1:
+        return [image]
+
+    # Mean brightness of every row; resizing to 1px wide does this in C
+    profile = image.convert("L").resize((1, height), Image.BOX).tobytes()
+    window = int(height / bands * TILE_CUT_SEARCH)
+
+    cuts = [0]
+    for i in range(1, bands):
+        target = height * i // bands
+        low = max(cuts[-1] + 1, target - window)
+        high = min(height - 1, target + window)
+        cuts.append(max(range(low, high + 1), key=lambda y: (profile[y], -abs(y - target))))
+    cuts.append(height)
+
+    return [image.crop((0, top, width, bottom)) for top, bottom in zip(cuts, cuts[1:])]
+
+
+class OCREngine:
+    """Process pool of tesseract workers that OCRs pages and image tiles in parallel."""
+
+    def __init__(self, workers: int = OCR_WORKERS, lang: str = OCR_LANG):
+        self.workers = max(1, workers)
+        self.lang = lang
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool (called automatically on first use)."""
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the Streamlit server process is multi-threaded
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+        return self
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool; it is restarted on the next OCR call."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def ocr_pages(self, pages: list) -> list:
+        """OCR a list of page images, returning one text per page in order."""
+        return [text for text, _ in self.ocr_pages_timed(pages)]
+
+    def ocr_pages_timed(self, pages: list) -> list:
+        """Like ocr_pages, but returns (text, ocr_seconds) per page."""
+        submitted = [self.submit_page(page) for page in pages]
+        return [self.collect_page(futures) for futures in submitted]
+
+    def submit_page(self, page: Image.Image) -> list:
+        """
+        Queue one page for OCR without waiting for it.
+
+        Returns the page's tile futures; pass them to collect_page() for the text.
+        """
+        self.start()
+        # Split tall pages so a single scan can still use every worker
+        bands = min(self.workers, max(1, page.height // TILE_MIN_HEIGHT))
+        return [
+            self._pool.submit(_ocr_tile, _encode(tile), self.lang)
+            for tile in split_into_bands(page, bands)
+        ]
+
+    @staticmethod
+    def collect_page(futures: list) -> tuple:
+        """Wait for a page's tile futures; returns (text, ocr_seconds), tiles in reading order."""
+        parts = []
+        seconds = 0.0
+        for future in futures:
+            text, elapsed = future.result()
+            parts.append(text.strip())
+            seconds += elapsed
+        return "\n".join(part for part in parts if part), seconds
+
+    def ocr_image(self, image: Image.Image) -> str:
+        """OCR a single image."""
+        return self.ocr_pages([image])[0]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> OCREngine:
+    """Return the process-wide OCR engine, which outlives Streamlit reruns."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OCREngine()
+        return _engine
+
+
+@atexit.register
+def shutdown_ocr_engine():
+    """Stop the shared engine's workers."""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.shutdown(wait=False)
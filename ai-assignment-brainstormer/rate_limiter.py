@@ -0,0 +1,190 @@
+# Client-side rate limiting: per-provider token buckets and a fair queue
+import itertools
+import threading
+import time
+from urllib.parse import urlparse
+
+# Free-tier quotas: host -> (requests/min, tokens/min or None, limit is per model)
+PROVIDER_RATE_LIMITS = {
+    "openrouter.ai": (20, None, False),  # free models share one account-wide limit
+    "api.groq.com": (30, 6000, True),
+    "generativelanguage.googleapis.com": (15, 1_000_000, True),
+    "api.moonshot.cn": (3, 32000, False),
+}
+DEFAULT_RATE_LIMIT = (60, None, False)
+
+# Lower runs first. Streamed answers are what a user is watching; complete
+# calls are mostly map/merge steps of long documents.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+CANCEL_POLL_SECONDS = 0.2  # how often a cancellable wait checks its event
+
+
+class TokenBucket:
+    """Refills continuously at rate per second up to capacity."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self._clock = clock
+        self._updated = clock()
+
+    def refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (call refill() first)."""
+        # A request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class _Ticket:
+    __slots__ = ("session", "tokens", "priority", "seq")
+
+    def __init__(self, session: str, tokens: int, priority: int, seq: int):
+        self.session = session
+        self.tokens = tokens
+        self.priority = priority
+        self.seq = seq
+
+
+class RateLimiter:
+    """
+    Request and token buckets for one provider (or model), with a fair
+    queue in front of them.
+
+    Waiting calls are served by priority, then round-robin across sessions
+    (the session served longest ago goes next), then in arrival order, so
+    one session's burst of map requests can't starve everyone else.
+    """
+
+    def __init__(self, rpm: float, tpm: float = None, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._last_served = {}  # session -> time its last call was let through
+        self._seq = itertools.count()
+
+    def _order(self) -> list:
+        # Simulate the round-robin to get the serving order of every waiter
+        last_served = dict(self._last_served)
+        pending = sorted(self._waiting, key=lambda ticket: ticket.seq)
+        order = []
+        step = itertools.count(1)
+        while pending:
+            ticket = min(pending, key=lambda t: (t.priority, last_served.get(t.session, 0.0), t.seq))
+            pending.remove(ticket)
+            order.append(ticket)
+            last_served[ticket.session] = self._clock() + next(step)
+        return order
+
+    def _wait_time(self, ticket: _Ticket) -> float:
+        self.requests.refill()
+        wait = self.requests.wait_time(1)
+        if self.tokens is not None:
+            self.tokens.refill()
+            wait = max(wait, self.tokens.wait_time(ticket.tokens))
+        return wait
+
+    def acquire(self, session: str, tokens: int = 0, priority: int = PRIORITY_BACKGROUND,
+                cancelled: threading.Event = None) -> bool:
+        """
+        Block until this call may go upstream; returns True.
+
+        If cancelled is set while waiting, the call leaves the queue without
+        taking anything and False is returned.
+        """
+        ticket = _Ticket(session, tokens, priority, next(self._seq))
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        return False
+                    order = self._order()
+                    wait = self._wait_time(order[0]) if order[0] is ticket else None
+                    if wait == 0:
+                        self.requests.take(1)
+                        if self.tokens is not None:
+                            self.tokens.take(tokens)
+                        self._last_served[session] = self._clock()
+                        return True
+                    if cancelled is not None:
+                        wait = CANCEL_POLL_SECONDS if wait is None else min(wait, CANCEL_POLL_SECONDS)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def try_acquire(self, session: str, tokens: int = 0, priority: int = PRIORITY_BACKGROUND) -> bool:
+        """Take a slot only if nobody is queued and the buckets allow it now."""
+        with self._cond:
+            if self._waiting or self._wait_time(_Ticket(session, tokens, priority, -1)) > 0:
+                return False
+            self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self._last_served[session] = self._clock()
+            return True
+
+    def charge(self, tokens: int):
+        """Count tokens used after the fact (e.g. the answer of a call)."""
+        if self.tokens is None or not tokens:
+            return
+        with self._cond:
+            self.tokens.refill()
+            self.tokens.level -= tokens
+
+    def status(self, session: str) -> dict:
+        """
+        Where a session's first waiting call stands: its 1-based position,
+        calls waiting in total, and an estimated wait in seconds.
+        None if the session has nothing queued.
+        """
+        with self._cond:
+            order = self._order()
+            position = next((i for i, ticket in enumerate(order) if ticket.session == session), None)
+            if position is None:
+                return None
+            self.requests.refill()
+            ahead = order[:position + 1]
+            wait = max(0.0, len(ahead) - self.requests.level) / self.requests.rate
+            if self.tokens is not None:
+                self.tokens.refill()
+                needed = sum(ticket.tokens for ticket in ahead)
+                wait = max(wait, (needed - self.tokens.level) / self.tokens.rate)
+            return {"position": position + 1, "waiting": len(order), "eta": wait}
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(base_url: str, model: str) -> RateLimiter:
+    """Return the process-wide limiter for a provider/model, creating it on first use."""
+    host = urlparse(str(base_url)).hostname or ""
+    rpm, tpm, per_model = PROVIDER_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+    key = (host, model if per_model else None)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(rpm, tpm)
+        return limiter
+
+
+def queue_status(session: str) -> dict:
+    """The session's most advanced waiting call across all limiters, or None."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    statuses = [status for status in (limiter.status(session) for limiter in limiters) if status]
+    return min(statuses, key=lambda status: status["position"], default=None)
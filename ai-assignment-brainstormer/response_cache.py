@@ -0,0 +1,165 @@
+# Response cache in front of generate_content: exact and near-duplicate topics
+import hashlib
+import os
+import random
+import re
+import struct
+import threading
+import unicodedata
+from database import get_cached_response, get_response_cache_candidates, save_cached_response
+from kimi_api import GENERATION_PROMPTS, generate_content, get_api_config
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+
+# Second tier: topics that are worded slightly differently ("Analisis
+# algoritma sorting dalam Python" / "analisis algoritma sorting di python")
+# share an answer when the MinHash estimate of their character-trigram
+# Jaccard similarity reaches the threshold. Off by default: a high
+# similarity can still hide a different subject ("... Python" / "... Java").
+NEAR_DUPLICATE_CACHE = os.getenv("RESPONSE_CACHE_NEAR_DUP", "0") == "1"
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_NEAR_DUP_THRESHOLD", "0.85"))
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs at 0.85 similarity almost always share a band
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(2024)  # fixed seed: signatures must be stable across restarts
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of this process, with the overall hit rate."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["exact_hits"] + stats["similar_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["exact_hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+    return stats
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", topic.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^\w+#]+", " ", text).split())
+
+
+def minhash(text: str) -> tuple:
+    """MinHash signature of the character trigrams of a normalised topic."""
+    padded = f" {text} "
+    shingles = {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(signature_a: tuple, signature_b: tuple) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(signature_a, signature_b)) / len(signature_a)
+
+
+def _lsh_buckets(signature: tuple) -> list:
+    rows = len(signature) // LSH_BANDS
+    buckets = []
+    for band in range(LSH_BANDS):
+        chunk = struct.pack(f"<{rows}Q", *signature[band * rows:(band + 1) * rows])
+        bucket = int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True)
+        buckets.append((band, bucket))
+    return buckets
+
+
+def _pack(signature: tuple) -> bytes:
+    return struct.pack(f"<{len(signature)}Q", *signature)
+
+
+def _unpack(data: bytes) -> tuple:
+    return struct.unpack(f"<{len(data) // 8}Q", data)
+
+
+def _scope(generation_type: str) -> str:
+    # Answers are only shared between requests that would send the same
+    # prompts to the same provider and model
+    template, system_prompt = GENERATION_PROMPTS[generation_type]
+    config = get_api_config() or {}
+    parts = [generation_type, template, system_prompt, config.get("base_url", ""), config.get("model", "")]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def _key(scope: str, topic: str) -> str:
+    return hashlib.sha256(f"{scope}\0{topic}".encode()).hexdigest()
+
+
+def lookup_response(topic: str, generation_type: str) -> tuple:
+    """
+    Find a cached answer for a topic; returns (response, match) or None,
+    where match is "exact" or "similar".
+    """
+    if not RESPONSE_CACHE or generation_type not in GENERATION_PROMPTS:
+        return None
+
+    scope = _scope(generation_type)
+    normalized = normalize_topic(topic)
+    response = get_cached_response(_key(scope, normalized), RESPONSE_CACHE_TTL)
+    if response is not None:
+        _count("exact_hits")
+        return response, "exact"
+
+    if NEAR_DUPLICATE_CACHE:
+        signature = minhash(normalized)
+        candidates = get_response_cache_candidates(scope, _lsh_buckets(signature), RESPONSE_CACHE_TTL)
+        scored = [
+            (similarity(signature, _unpack(stored)), key)
+            for key, stored in candidates if stored
+        ]
+        for score, key in sorted(scored, reverse=True):
+            if score < NEAR_DUPLICATE_THRESHOLD:
+                break
+            response = get_cached_response(key, RESPONSE_CACHE_TTL)
+            if response is not None:
+                _count("similar_hits")
+                return response, "similar"
+
+    _count("misses")
+    return None
+
+
+def store_response(topic: str, generation_type: str, response: str):
+    """Cache a freshly generated answer for later lookups."""
+    if not RESPONSE_CACHE or not response or generation_type not in GENERATION_PROMPTS:
+        return
+
+    scope = _scope(generation_type)
+    normalized = normalize_topic(topic)
+    signature = minhash(normalized)
+    save_cached_response(
+        _key(scope, normalized), scope, normalized, response,
+        signature=_pack(signature), buckets=_lsh_buckets(signature), max_age=RESPONSE_CACHE_TTL
+    )
+    _count("stores")
+
+
+def cached_generate_content(topic: str, generation_type: str, refresh: bool = False) -> str:
+    """generate_content with the response cache; refresh=True always asks the model."""
+    if not refresh:
+        cached = lookup_response(topic, generation_type)
+        if cached is not None:
+            return cached[0]
+
+    response = generate_content(topic, generation_type)
+    store_response(topic, generation_type, response)
+    return response
@@ -0,0 +1,209 @@
+# Map-reduce summarisation for documents larger than the model context
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from kimi_api import estimate_tokens, generate_content_ai, generate_content_ai_stream, in_current_session
+from rate_limiter import CANCEL_POLL_SECONDS
+
+# Token budget for the document text in one request (prompt instructions and
+# the model's answer need room too)
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000"))
+# Parallel LLM calls per document
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+SYSTEM_PROMPT = """You are a study assistant for Indonesian university students.
+Turn lecture material into clear, well-structured study aids.
+Respond in Bahasa Indonesia unless the material is clearly in another language."""
+
+# Whole document fits in one request
+DIRECT_PROMPTS = {
+    "summary": "Buatkan ringkasan singkat dan jelas dari materi berikut dalam Bahasa Indonesia:\n\n{text}",
+    "outline": "Buatkan outline/kerangka materi dari dokumen berikut untuk memudahkan belajar:\n\n{text}",
+    "notes": "Buatkan catatan belajar yang terstruktur dari materi berikut, dengan poin-poin penting:\n\n{text}",
+    "quiz": "Buatkan 5-10 soal latihan beserta jawabannya berdasarkan materi berikut:\n\n{text}",
+}
+
+# Map: one request per chunk of the document
+MAP_PROMPTS = {
+    "summary": "Ringkas bagian {part} dari sebuah dokumen panjang berikut. Pertahankan semua poin penting:\n\n{text}",
+    "outline": "Buatkan outline untuk bagian {part} dari sebuah dokumen panjang berikut:\n\n{text}",
+    "notes": "Buatkan catatan poin-poin penting dari bagian {part} dokumen berikut:\n\n{text}",
+    "quiz": "Catat konsep, definisi, dan fakta penting dari bagian {part} dokumen berikut yang bisa dijadikan soal latihan:\n\n{text}",
+}
+
+# Reduce: combine the per-chunk results into the final answer
+REDUCE_PROMPTS = {
+    "summary": "Gabungkan ringkasan per bagian berikut menjadi satu ringkasan singkat dan jelas dalam Bahasa Indonesia:\n\n{text}",
+    "outline": "Gabungkan outline per bagian berikut menjadi satu outline/kerangka materi yang utuh untuk memudahkan belajar:\n\n{text}",
+    "notes": "Gabungkan catatan per bagian berikut menjadi satu catatan belajar yang terstruktur, dengan poin-poin penting:\n\n{text}",
+    "quiz": "Buatkan 5-10 soal latihan beserta jawabannya berdasarkan catatan materi berikut:\n\n{text}",
+}
+
+# Intermediate reduce when the partial results themselves are too long
+MERGE_PROMPT = "Gabungkan dan padatkan catatan per bagian berikut tanpa menghilangkan poin penting:\n\n{text}"
+
+
+def split_into_chunks(segments: list, token_budget: int = CHUNK_TOKEN_BUDGET) -> list:
+    """
+    Pack page/slide segments into chunks of at most token_budget tokens.
+
+    Segments are only split when a single one is over budget, first on
+    paragraph and then on line boundaries.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for segment in _fit_segments(segments, token_budget):
+        tokens = estimate_tokens(segment)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _fit_segments(segments: list, token_budget: int):
+    """Yield segments, breaking up any that are larger than the budget."""
+    for segment in segments:
+        if estimate_tokens(segment) <= token_budget:
+            yield segment
+            continue
+
+        for separator in ("\n\n", "\n"):
+            pieces = segment.split(separator)
+            if len(pieces) > 1:
+                yield from split_into_chunks(pieces, token_budget)
+                break
+        else:
+            # No line breaks at all: cut by characters
+            step = token_budget * 4
+            for start in range(0, len(segment), step):
+                yield segment[start:start + step]
+
+
+class MapReduceSummarizer:
+    """
+    Turns a document into a summary, outline, notes or quiz, whatever its length.
+
+    Segments (pages/slides) can be fed while the document is still being
+    extracted. Once they overflow one chunk, each full chunk is sent to the
+    model right away (map); finish() then combines the chunk results (reduce).
+    A document that fits in one chunk gets a single direct request.
+
+    Setting cancelled abandons the work: waits for map and merge results stop
+    and finish()/finish_stream() end early with nothing (or what was written).
+    """
+
+    def __init__(self, generation_type: str, llm=generate_content_ai, llm_stream=generate_content_ai_stream,
+                 token_budget: int = CHUNK_TOKEN_BUDGET, concurrency: int = SUMMARY_CONCURRENCY,
+                 cancelled: threading.Event = None):
+        if generation_type not in DIRECT_PROMPTS:
+            raise ValueError(f"Unknown generation type: {generation_type}")
+        self.generation_type = generation_type
+        self.llm = llm  # llm(prompt, system_prompt) -> str
+        self.llm_stream = llm_stream  # llm_stream(prompt, system_prompt, cancelled) -> text deltas
+        self.token_budget = token_budget
+        self.cancelled = cancelled
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._current = []
+        self._map_futures = []
+
+    def feed(self, segment: str):
+        """Add the next page/slide of the document."""
+        for piece in _fit_segments([segment], self.token_budget):
+            if self._current and self._tokens(self._current + [piece]) > self.token_budget:
+                self._submit_map()
+            self._current.append(piece)
+
+    def finish(self) -> str:
+        """Wait for the map step and return the combined result."""
+        try:
+            prompt = self._final_prompt()
+            return "" if prompt is None else self.llm(prompt, SYSTEM_PROMPT)
+        finally:
+            self.close()
+
+    def finish_stream(self):
+        """Like finish(), but yields the final answer in pieces as it is written."""
+        try:
+            prompt = self._final_prompt()
+            if prompt is not None:
+                yield from self.llm_stream(prompt, SYSTEM_PROMPT, self.cancelled)
+        finally:
+            self.close()
+
+    def summarize(self, segments: list) -> str:
+        """Feed a whole document at once and return the result."""
+        for segment in segments:
+            self.feed(segment)
+        return self.finish()
+
+    def close(self):
+        """Drop any queued work (e.g. when extraction failed part-way)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _results(self, futures: list):
+        # Results in order, or None once cancelled (checked while waiting)
+        pending = set(futures)
+        while pending:
+            if self.cancelled is not None and self.cancelled.is_set():
+                return None
+            _, pending = wait(pending, timeout=CANCEL_POLL_SECONDS if self.cancelled is not None else None)
+        return [future.result() for future in futures]
+
+    def _tokens(self, pieces: list) -> int:
+        return sum(estimate_tokens(piece) for piece in pieces)
+
+    def _submit_map(self):
+        part = len(self._map_futures) + 1
+        prompt = MAP_PROMPTS[self.generation_type].format(part=part, text="\n\n".join(self._current))
+        self._map_futures.append(self._executor.submit(in_current_session(self.llm), prompt, SYSTEM_PROMPT))
+        self._current = []
+
+    def _final_prompt(self) -> str:
+        # The one request whose answer is shown to the user; None if cancelled
+        if not self._map_futures:
+            text = "\n\n".join(self._current)
+            return DIRECT_PROMPTS[self.generation_type].format(text=text)
+
+        if self._current:
+            self._submit_map()
+        partials = self._results(self._map_futures)
+        return None if partials is None else self._reduce_prompt(partials)
+
+    def _reduce_prompt(self, partials: list) -> str:
+        # Merge level by level until the partial results fit in one request
+        llm = in_current_session(self.llm)
+        half_budget = self.token_budget // 2
+
+        def merge(text):
+            return llm(MERGE_PROMPT.format(text=text), SYSTEM_PROMPT)
+
+        def condense(partial):
+            return merge(partial) if estimate_tokens(partial) > half_budget else partial
+
+        while len(partials) > 1 and self._tokens(partials) > self.token_budget:
+            groups = split_into_chunks(partials, self.token_budget)
+            if len(groups) < len(partials):
+                merged = self._results([self._executor.submit(merge, group) for group in groups])
+            else:
+                # No two neighbours fit in one request, so every pair has a
+                # partial over half the budget: condense those on their own
+                # so they can be grouped on the next level
+                merged = self._results([self._executor.submit(condense, partial) for partial in partials])
+            if merged is None:
+                return None
+            if self._tokens(merged) >= self._tokens(partials):
+                break  # the model is not making them any shorter
+            partials = merged
+
+        text = "\n\n".join(f"--- Bagian {i} ---\n{partial}" for i, partial in enumerate(partials, 1))
+        return REDUCE_PROMPTS[self.generation_type].format(text=text)
+
+
+def summarize_document(segments: list, generation_type: str, **kwargs) -> str:
+    """Summarise a list of page/slide texts as summary, outline, notes or quiz."""
+    return MapReduceSummarizer(generation_type, **kwargs).summarize(segments)
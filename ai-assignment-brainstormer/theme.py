@@ -0,0 +1,332 @@
+# Theme palettes and the app's custom CSS, built once per theme at import
+# (app.py reruns on every interaction; this module is only imported once)
+
+THEMES = {
+    # DARK MODE: CSS Overrides needed
+    "dark": {
+        "bg_color": "#0e1117",
+        "card_bg": "#262730",
+        "border_color": "#333333",
+        "text_color": "#ffffff",
+        "text_secondary": "#bbbbbb",
+        "accent_primary": "#DC143C",  # Crimson
+        "accent_hover": "#b01030",
+        "highlight_color": "#DC143C",
+    },
+    # LIGHT MODE: Matches config.toml defaults
+    "light": {
+        "bg_color": "#ffffff",
+        "card_bg": "#f0f4ff",
+        "border_color": "#e0e0e0",
+        "text_color": "#000000",
+        "text_secondary": "#333333",
+        "accent_primary": "#0056b3",
+        "accent_hover": "#004494",
+        "highlight_color": "#FFD700",  # Gold
+    },
+}
+
+
+def _build_css(bg_color, card_bg, border_color, text_color, text_secondary,
+               accent_primary, accent_hover, highlight_color) -> str:
+    """Custom CSS for clean, flat UI."""
+    return f"""
+<style>
+    /* v1.5 Force Refresh */
+    /* Import Inter Font */
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
+    
+    /* Base App Styling */
+    .stApp {{
+        background-color: {bg_color};
+        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
+        color: {text_color} !important;
+    }}
+    
+    /* Header Bar - must match background */
+    header[data-testid="stHeader"] {{
+        background-color: {bg_color} !important;
+    }}
+    
+    /* Top toolbar/decoration bar */
+    .stDeployButton, [data-testid="stToolbar"] {{
+        background-color: {bg_color} !important;
+    }}
+    
+    h1, h2, h3, h4, h5, h6, span, div, p, label, .stMarkdown, .stText {{
+        font-family: 'Inter', sans-serif;
+        color: {text_color} !important;
+    }}
+    
+    /* Input Fields (Text Area, Inputs, Selectbox) */
+
+    /* Input Fields (Text Area, Inputs, Selectbox) */
+    .stTextArea textarea, .stTextInput input, .stSelectbox div[data-baseweb="select"] {{
+        background-color: {card_bg} !important;
+        color: {text_color} !important;
+        border: 1px solid {border_color} !important;
+        border-radius: 8px !important;
+        box-shadow: none !important;
+    }}
+    
+    /* Force textarea text color */
+    textarea {{
+        color: {text_color} !important;
+        caret-color: {text_color} !important;
+    }}
+    
+    /* Placeholder text */
+    textarea::placeholder {{
+        color: {text_secondary} !important;
+        opacity: 0.7;
+    }}
+    
+    /* Selectbox dropdown styling */
+    .st-cp, .st-cq, .st-cr, .st-cs {{
+        background-color: {card_bg} !important;
+        color: {text_color} !important;
+    }}
+    
+    /* Stronger Label Selectors */
+    div[data-testid="stMarkdownContainer"] p, 
+    div[data-testid="stMarkdownContainer"] span,
+    label[data-testid="stWidgetLabel"] p {{
+        color: {text_color} !important;
+        font-weight: 500;
+    }}
+    
+    .stTextArea textarea:focus, .stTextInput input:focus {{
+        border-color: {accent_primary} !important;
+        box-shadow: 0 0 0 1px {accent_primary} !important;
+    }}
+
+    /* Tabs - Explicit coloring */
+    button[data-baseweb="tab"] div[data-testid="stMarkdownContainer"] p {{
+        color: {text_secondary} !important;
+    }}
+    
+    button[data-baseweb="tab"][aria-selected="true"] div[data-testid="stMarkdownContainer"] p {{
+        color: {accent_primary} !important;
+        font-weight: 600;
+    }}
+    
+    /* Force Tab Underline Color - hide default, show only theme color */
+    button[data-baseweb="tab"][aria-selected="true"] {{
+        border-bottom: 3px solid {accent_primary} !important;
+    }}
+    
+    /* Hide Streamlit's default blue highlight bar */
+    .stTabs [data-baseweb="tab-highlight"] {{
+        background-color: {accent_primary} !important;
+    }}
+    
+    /* Tabs Container underline */
+    .stTabs [data-baseweb="tab-list"] {{
+        gap: 2rem;
+        background-color: transparent;
+        border-bottom: 1px solid {border_color};
+        padding-bottom: 0;
+    }}
+    
+    /* File Uploader Dropzone - Theme-aware Background */
+    [data-testid="stFileUploaderDropzone"] {{
+        background-color: {card_bg} !important;
+        border: 1px dashed {border_color} !important;
+        border-radius: 8px;
+    }}
+    
+    .st-emotion-cache-12izz8t {{
+        background-color: {card_bg} !important;
+    }}
+    
+    /* Expander Summary - Theme-aware Background */
+    .st-emotion-cache-gsdrzw, summary {{
+        background-color: {card_bg} !important;
+        border-radius: 8px;
+        padding: 0.5rem;
+    }}
+    section[data-testid="stSidebar"] {{
+        background-color: {bg_color};
+        border-right: 1px solid {border_color};
+    }}
+    
+    section[data-testid="stSidebar"] h1, section[data-testid="stSidebar"] h2, section[data-testid="stSidebar"] h3 {{
+        color: {text_color} !important;
+    }}
+    
+    section[data-testid="stSidebar"] p, section[data-testid="stSidebar"] span, section[data-testid="stSidebar"] li {{
+        color: {text_secondary} !important;
+    }}
+    
+    /* Tabs */
+    .stTabs [data-baseweb="tab-list"] {{
+        gap: 2rem;
+        background-color: transparent;
+        border-bottom: 1px solid {border_color};
+        padding-bottom: 0;
+    }}
+    
+    .stTabs [data-baseweb="tab"] {{
+        background-color: transparent;
+        border: none;
+        color: {text_secondary};
+        padding-bottom: 10px;
+    }}
+    
+    .stTabs [aria-selected="true"] {{
+        background-color: transparent !important;
+        color: {accent_primary} !important;
+        font-weight: 600;
+        border-bottom: 2px solid {accent_primary};
+    }}
+    
+    /* Main Header - Clean & Simple */
+    .main-header {{
+        padding: 2rem 0;
+        margin-bottom: 2rem;
+        border-bottom: 1px solid {border_color};
+    }}
+    
+    .main-header h1 {{
+        color: {accent_primary};
+        font-weight: 700;
+        letter-spacing: -0.02em;
+        margin-bottom: 0.5rem;
+    }}
+    
+    .main-header p {{
+        color: {text_secondary};
+        font-size: 1.1rem;
+    }}
+    
+    /* Primary Buttons */
+    .stButton > button {{
+        background-color: {accent_primary} !important;
+        color: white !important;
+        border: none !important;
+        border-radius: 8px !important;
+        padding: 0.6rem 1.5rem !important;
+        font-weight: 500 !important;
+        box-shadow: none !important;
+        transition: background-color 0.2s;
+    }}
+    
+    .stButton > button:hover {{
+        background-color: {accent_hover} !important;
+    }}
+    
+    /* File Uploader */
+    [data-testid="stFileUploader"] {{
+        background-color: {card_bg};
+        border: 1px dashed {border_color};
+        border-radius: 8px;
+        padding: 20px;
+    }}
+    
+    /* Result Container */
+    .result-container {{
+        background-color: {card_bg};
+        border: 1px solid {border_color};
+        border-left: 6px solid {highlight_color}; /* Gold in Light Mode */
+        border-radius: 8px;
+        padding: 2rem;
+        margin-top: 1.5rem;
+    }}
+    
+    .result-container * {{
+        color: {text_color} !important;
+    }}
+    
+    .result-container code {{
+        background-color: {bg_color} !important;
+        border: 1px solid {border_color};
+        color: {accent_primary} !important;
+        border-radius: 4px;
+        padding: 2px 5px;
+    }}
+    
+    /* Donation Box - Outline Style */
+    .donation-box {{
+        border: 2px solid {highlight_color}; /* Gold Border */
+        background-color: {card_bg};
+        border-radius: 12px;
+        padding: 1.5rem;
+        text-align: center;
+        margin-top: 2rem;
+    }}
+    
+    .donation-box h3 {{
+        font-size: 1rem;
+        margin-bottom: 0.5rem;
+        color: {text_color};
+    }}
+    
+    .donation-box p {{
+        font-size: 0.85rem;
+        color: {text_secondary};
+        margin-bottom: 1rem;
+    }}
+    
+    .donation-btn {{
+        display: inline-block;
+        background-color: transparent;
+        color: {accent_primary} !important;
+        border: 1px solid {accent_primary};
+        padding: 0.5rem 1.5rem;
+        border-radius: 6px;
+        text-decoration: none;
+        font-weight: 500;
+        font-size: 0.9rem;
+        transition: all 0.2s;
+    }}
+    
+    .donation-btn:hover {{
+        background-color: {accent_primary};
+        color: white !important;
+    }}
+    
+    /* History Items */
+    .history-item {{
+        padding: 0.8rem;
+        border-bottom: 1px solid {border_color};
+    }}
+    
+    .history-item:last-child {{
+        border-bottom: none;
+    }}
+    
+    .history-item strong {{
+        display: block;
+        font-size: 0.9rem;
+        margin-bottom: 0.2rem;
+        color: {text_color};
+    }}
+    
+    .history-item small {{
+        font-size: 0.75rem;
+        color: {text_secondary};
+    }}
+    
+    /* Expander */
+    .streamlit-expanderHeader {{
+        background-color: transparent !important;
+        color: {text_color} !important;
+        border: 1px solid {border_color};
+        border-radius: 8px;
+    }}
+    
+    /* Alerts/Success */
+    .stAlert {{
+        background-color: {card_bg};
+        border: 1px solid {border_color};
+        color: {text_color};
+    }}
+    
+    /* Hide Default Branding */
+    #MainMenu {{visibility: hidden;}}
+    footer {{visibility: hidden;}}
+</style>
+"""
+
+
+THEME_CSS = {name: _build_css(**colors) for name, colors in THEMES.items()}